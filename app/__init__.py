@@ -22,21 +22,27 @@ login_manager.login_message_category = 'warning'
 def register_all_plugin_blueprints(app):
     """Register blueprints for all plugins during app initialization"""
     try:
-        from app.plugins.plugin import Plugin
+        from app.plugins.plugin import Plugin, PluginStatus
         from app.plugins.plugin_manager import PluginManager
         
+        plugin_manager = PluginManager()
         plugins = Plugin.query.all()
         for plugin in plugins:
             try:
-                # Load the plugin class
-                plugin_class = plugin.load()
+                # Load the plugin class through the manager so it is imported once
+                plugin_class = plugin_manager._load_plugin_class(plugin)
                 if plugin_class:
                     # Initialize the plugin
                     instance = plugin_class()
                     
+                    # Reuse this instance for active plugins instead of building another
+                    if plugin.status == PluginStatus.ACTIVE.value:
+                        plugin_manager.set_plugin_instance(plugin.slug, instance)
+                    
                     # Register blueprint if the plugin provides one
-                    if hasattr(instance, 'get_blueprint'):
-                        blueprint = instance.get_blueprint()
+                    get_blueprint = getattr(instance, 'get_blueprint', None)
+                    if get_blueprint is not None:
+                        blueprint = get_blueprint()
                         if blueprint and blueprint.name not in app.blueprints:
                             app.register_blueprint(blueprint)
                             app.logger.info(f"Pre-registered blueprint for plugin {plugin.slug}")
@@ -56,6 +62,13 @@ def create_app():
     config_obj = config_by_name[os.getenv('FLASK_ENV', 'development')]
     app.config.from_object(config_obj)
     
+    # Let workers reuse compiled templates instead of each compiling them again
+    bytecode_cache_dir = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if bytecode_cache_dir:
+        from jinja2 import FileSystemBytecodeCache
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+    
     # Initialize extensions with app
     db.init_app(app)
     migrate.init_app(app, db)
@@ -87,22 +100,10 @@ def create_app():
         
         if tenant and current_user.is_authenticated:
             try:
-                # Get active plugins for this tenant
+                # Get menu items from each active plugin for this tenant
                 from app.plugins.plugin_manager import PluginManager
                 plugin_manager = PluginManager()
-                
-                # Get menu items from each plugin
-                plugins = plugin_manager.get_tenant_plugins(tenant.id)
-                
-                for plugin in plugins:
-                    instance = plugin_manager.get_plugin_instance(plugin.slug, tenant.id)
-                    if instance and hasattr(instance, 'get_menu_items'):
-                        try:
-                            items = instance.get_menu_items()
-                            if items:
-                                plugin_menu_items.extend(items)
-                        except Exception as e:
-                            app.logger.error(f"Error getting menu items for plugin {plugin.slug}: {str(e)}")
+                plugin_menu_items = plugin_manager.get_tenant_plugin_menu_items(tenant.id)
             except Exception as e:
                 app.logger.error(f"Error getting plugin menu items: {str(e)}")
                 import traceback
@@ -227,39 +228,29 @@ def create_app():
                     enabled_for_all=True
                 ).all()
                 
-                # Combine them (avoiding duplicates)
+                # Combine them, keyed by plugin id so a tenant-specific row wins
+                # over the same plugin being enabled for all
+                seen = {tp.plugin_id: (tp.plugin, tenant_id) for tp in tenant_plugins}
+                for plugin in global_plugins:
+                    seen.setdefault(plugin.id, (plugin, None))
+                
                 plugin_manager = PluginManager()
                 result = []
                 
-                # Process tenant-specific plugins
-                for tp in tenant_plugins:
-                    instance = plugin_manager.get_plugin_instance(tp.plugin.slug, tenant_id)
+                for plugin, instance_tenant_id in seen.values():
+                    instance = plugin_manager.get_plugin_instance(plugin.slug, instance_tenant_id)
                     if instance and hasattr(instance, 'get_menu_items'):
                         menu_items = instance.get_menu_items()
                         result.append({
-                            'id': tp.plugin.id,
-                            'name': tp.plugin.name,
-                            'slug': tp.plugin.slug,
+                            'id': plugin.id,
+                            'name': plugin.name,
+                            'slug': plugin.slug,
                             'menu_items': menu_items
                         })
                 
-                # Process global plugins (if not already added)
-                plugin_slugs = {p['slug'] for p in result}
-                for plugin in global_plugins:
-                    if plugin.slug not in plugin_slugs:
-                        instance = plugin_manager.get_plugin_instance(plugin.slug)
-                        if instance and hasattr(instance, 'get_menu_items'):
-                            menu_items = instance.get_menu_items()
-                            result.append({
-                                'id': plugin.id,
-                                'name': plugin.name,
-                                'slug': plugin.slug,
-                                'menu_items': menu_items
-                            })
-                
                 return result
             except Exception as e:
-                current_app.logger.error(f"Error fetching tenant plugins: {str(e)}")
+                app.logger.error(f"Error fetching tenant plugins: {str(e)}")
                 return []
         
         return {
@@ -328,6 +319,11 @@ def create_app():
     from app.core.error_handlers import register_handlers
     register_handlers(app)
     
+    # Flag requests that issue too many queries while developing
+    if app.debug:
+        from app.core.query_counter import register_query_counter
+        register_query_counter(app)
+    
     # Insert default roles
     with app.app_context():
         try:
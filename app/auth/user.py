@@ -78,11 +78,18 @@ class User(UserMixin, BaseModel):
             return True
         
         # Check if any of the user's roles have the permission
-        for role in self.roles:
-            if permission in role.permissions:
-                return True
-        
-        return False
+        return permission in self.get_permissions()
+    
+    def get_permissions(self):
+        """Get the union of the user's role permissions, built once per loaded user"""
+        # Flask-Login loads the user once per request, so this lives as long as the request
+        permissions = getattr(self, '_permissions', None)
+        if permissions is None:
+            permissions = set()
+            for role in self.roles:
+                permissions.update(role.permissions or ())
+            self._permissions = permissions
+        return permissions
     
     def has_role(self, role_name):
         """Check if user has a specific role"""
@@ -1,6 +1,7 @@
 from contextlib import contextmanager
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import sessionmaker
 from app import db
 
 class Database:
@@ -11,8 +12,7 @@ class Database:
         """Get SQLAlchemy engine"""
         if app:
             return db.get_engine(app)
-        else:
-            return create_engine(database_url)
+        return create_engine(database_url)
     
     @staticmethod
     @contextmanager
@@ -29,8 +29,8 @@ class Database:
         else:
             # Create standalone session
             engine = Database.get_engine(database_url=database_url)
-            session_factory = sessionmaker(bind=engine)
-            session = scoped_session(session_factory)
+            # A plain session is enough here; it never outlives this block
+            session = sessionmaker(bind=engine)()
             try:
                 yield session
                 session.commit()
@@ -39,6 +39,8 @@ class Database:
                 raise
             finally:
                 session.close()
+                # The engine was created for this block only; release its pool
+                engine.dispose()
     
     @staticmethod
     def create_schema(engine, schema_name):
@@ -53,11 +55,24 @@ class Database:
     @staticmethod
     def list_schemas(engine):
         """List all schemas in the database"""
-        result = engine.execute(
-            "SELECT schema_name FROM information_schema.schemata "
-            "WHERE schema_name NOT LIKE 'pg_%' AND schema_name != 'information_schema'"
-        )
-        return [row[0] for row in result]
+        # pg_namespace is a single catalog table, unlike the information_schema view
+        with engine.connect() as connection:
+            result = connection.execute(text(
+                "SELECT nspname FROM pg_catalog.pg_namespace "
+                "WHERE nspname NOT LIKE 'pg_%' AND nspname <> 'information_schema'"
+            ))
+            return [row[0] for row in result]
+
+def rows_fingerprint(model, *criteria):
+    """Hash of the id and updated_at of every matching row
+    
+    Unlike count plus max(updated_at), this changes whenever any row changes,
+    even if its transaction started before, but committed after, a newer write.
+    """
+    row_key = db.func.concat(model.id, ':', model.updated_at)
+    return db.session.query(db.func.md5(db.func.coalesce(
+        db.func.string_agg(aggregate_order_by(row_key, model.id), ','), ''
+    ))).filter(*criteria).scalar()
 
 # Base model class
 class BaseModel(db.Model):
@@ -65,9 +80,13 @@ class BaseModel(db.Model):
     __abstract__ = True
     
     id = db.Column(db.Integer, primary_key=True)
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    # Populated by the database so bulk inserts don't bind a value per row.
+    # default= renders now() into ORM inserts too, so tables created before
+    # the server defaults existed (e.g. by a plugin install) still get a value
+    created_at = db.Column(db.DateTime, default=db.func.now(), server_default=db.func.now())
     updated_at = db.Column(
         db.DateTime, 
-        default=db.func.current_timestamp(),
-        onupdate=db.func.current_timestamp()
+        default=db.func.now(),
+        server_default=db.func.now(),
+        onupdate=db.func.now()
     )
\ No newline at end of file
@@ -0,0 +1,17 @@
+from flask import current_app
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(obj):
+    """Encode obj as JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode('utf-8')
+
+def ojsonify(obj):
+    """Like jsonify, but serialized with dumps"""
+    return current_app.response_class(dumps(obj), mimetype='application/json')
@@ -0,0 +1,21 @@
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+def register_query_counter(app):
+    """Count SQL statements per request and warn when a request issues too many"""
+    threshold = app.config.get('SQL_QUERY_WARN_THRESHOLD', 20)
+    
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        """Increment the current request's statement count"""
+        if has_request_context():
+            g.sql_count = g.get('sql_count', 0) + 1
+    
+    @app.after_request
+    def report_query_count(response):
+        """Log requests whose statement count exceeds the threshold"""
+        sql_count = g.get('sql_count', 0)
+        if sql_count > threshold:
+            app.logger.warning(f"{request.method} {request.path}: {sql_count} queries")
+        return response
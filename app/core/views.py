@@ -1,11 +1,26 @@
-from flask import Blueprint, render_template, redirect, url_for, current_app
+from flask import Blueprint, Response, render_template, redirect, url_for, current_app
 from flask_login import current_user, login_required
+from app import db
 from app.tenant.tenant import Tenant
 from app.auth.user import User
 from datetime import datetime
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.orm import contains_eager
+
+# Resolve plugin models once at import time rather than on every request
+try:
+    from app.plugins.plugin import Plugin
+    from app.plugins.tenant_plugin import TenantPlugin
+    _PLUGINS_AVAILABLE = True
+except ImportError:
+    # Plugin module not available yet
+    _PLUGINS_AVAILABLE = False
+
 main_bp = Blueprint('main', __name__)
 
+# Static health check payload, encoded once
+_HEALTH_BODY = b'{"status":"ok","message":"Service is running"}'
+
 @main_bp.route('/')
 @login_required
 def index():
@@ -14,10 +29,14 @@ def index():
     if current_user.is_system_admin:
         # System admin dashboard with all tenants
         tenants = Tenant.query.all()
-        user_count = User.query.count()
-        active_user_count = User.query.filter_by(is_active=True).count()
-        tenant_count = Tenant.query.count()
-        active_tenant_count = Tenant.query.filter_by(status='active').count()
+        user_count = db.session.scalar(select(func.count()).select_from(User))
+        active_user_count = db.session.scalar(
+            select(func.count()).select_from(User).where(User.is_active.is_(True))
+        )
+        tenant_count = db.session.scalar(select(func.count()).select_from(Tenant))
+        active_tenant_count = db.session.scalar(
+            select(func.count()).select_from(Tenant).where(Tenant.status == 'active')
+        )
         
         # Get user counts for each tenant
         tenant_user_counts = {}
@@ -33,16 +52,10 @@ def index():
         tenant_plugins = []
         
         # Only fetch plugin data if plugin module is available
-        try:
-            from app.plugins.plugin import Plugin
-            from app.plugins.tenant_plugin import TenantPlugin
-            
+        if _PLUGINS_AVAILABLE:
             plugins = Plugin.query.all()
             active_plugins = Plugin.query.filter_by(status='active').all()
             tenant_plugins = TenantPlugin.query.filter_by(enabled=True).all()
-        except ImportError:
-            # Plugin module not available yet
-            pass
         
         return render_template('dashboard/admin_dashboard.html', 
                               title='System Dashboard',
@@ -62,31 +75,25 @@ def index():
         tenant_users = User.query.filter_by(tenant_id=tenant.id).all() if tenant else []
         # Create a usage dictionary for the tenant
         from app.tenant.quota import QuotaManager, ResourceType
+        storage_usage = QuotaManager.get_usage(tenant, ResourceType.STORAGE)
         tenant_usage = {
             'users': len(tenant_users),
             'users_percentage': int((len(tenant_users) / tenant.max_users * 100) if tenant.max_users > 0 else 0),
-            'storage_mb': QuotaManager.get_usage(tenant, ResourceType.STORAGE),
-            'storage_percentage': QuotaManager.get_usage_percentage(tenant, ResourceType.STORAGE)
+            'storage_mb': storage_usage,
+            'storage_percentage': QuotaManager.get_usage_percentage(tenant, ResourceType.STORAGE, storage_usage)
         }
         # Get tenant plugins if plugin module is available
         tenant_plugins = []
-        try:
-            if tenant:
-                from app.plugins.tenant_plugin import TenantPlugin
-                from app.plugins.plugin import Plugin
-                
-                # Get enabled plugins for this tenant
-                tenant_plugin_records = TenantPlugin.query.filter_by(
-                    tenant_id=tenant.id,
-                    enabled=True
-                ).join(Plugin).filter(
-                    Plugin.status == 'active'
-                ).all()
-                
-                tenant_plugins = [tp.plugin for tp in tenant_plugin_records]
-        except ImportError:
-            # Plugin module not available yet
-            pass
+        if _PLUGINS_AVAILABLE and tenant:
+            # Get enabled plugins for this tenant
+            tenant_plugin_records = TenantPlugin.query.filter_by(
+                tenant_id=tenant.id,
+                enabled=True
+            ).join(Plugin).filter(
+                Plugin.status == 'active'
+            ).options(contains_eager(TenantPlugin.plugin)).all()
+            
+            tenant_plugins = [tp.plugin for tp in tenant_plugin_records]
         
         return render_template('dashboard/tenant_admin_dashboard.html',
                               title='Tenant Admin Dashboard',
@@ -99,30 +106,23 @@ def index():
         # Regular user dashboard
         # Get user's tenant plugins if plugin module is available
         tenant_plugins = []
-        try:
-            tenant = current_user.tenant
-            if tenant:
-                from app.plugins.tenant_plugin import TenantPlugin
-                from app.plugins.plugin import Plugin
-                
-                # Get enabled plugins for this tenant
-                tenant_plugin_records = TenantPlugin.query.filter_by(
-                    tenant_id=tenant.id,
-                    enabled=True
-                ).join(Plugin).filter(
-                    Plugin.status == 'active'
-                ).all()
-                
-                tenant_plugins = [tp.plugin for tp in tenant_plugin_records]
-        except ImportError:
-            # Plugin module not available yet
-            pass
+        tenant = current_user.tenant
+        if _PLUGINS_AVAILABLE and tenant:
+            # Get enabled plugins for this tenant
+            tenant_plugin_records = TenantPlugin.query.filter_by(
+                tenant_id=tenant.id,
+                enabled=True
+            ).join(Plugin).filter(
+                Plugin.status == 'active'
+            ).options(contains_eager(TenantPlugin.plugin)).all()
+            
+            tenant_plugins = [tp.plugin for tp in tenant_plugin_records]
             
         return render_template('dashboard/user_dashboard.html',
                              title='Dashboard',
                              tenant_plugins=tenant_plugins)
 
-@main_bp.route('/health')
+@main_bp.route('/health', methods=['GET', 'HEAD'], strict_slashes=False)
 def health_check():
     """Health check endpoint"""
-    return {'status': 'ok', 'message': 'Service is running'}
\ No newline at end of file
+    return Response(_HEALTH_BODY, mimetype='application/json')
@@ -151,11 +151,15 @@ def debug_plugin(slug):
     
     # Get tenant assignments
     click.echo("\nTenant Assignments:")
-    tenant_plugins = TenantPlugin.query.filter_by(plugin_id=plugin.id, enabled=True).all()
-    if tenant_plugins:
-        for tp in tenant_plugins:
-            tenant = Tenant.query.get(tp.tenant_id)
-            click.echo(f"  - {tenant.name} ({tenant.slug})")
+    tenants = db.session.query(Tenant.name, Tenant.slug).join(
+        TenantPlugin, TenantPlugin.tenant_id == Tenant.id
+    ).filter(
+        TenantPlugin.plugin_id == plugin.id,
+        TenantPlugin.enabled == True
+    ).all()
+    if tenants:
+        for tenant_name, tenant_slug in tenants:
+            click.echo(f"  - {tenant_name} ({tenant_slug})")
     else:
         click.echo("  No tenants have this plugin enabled.")
     
@@ -1,7 +1,10 @@
 """Plugin model and plugin management"""
 from app import db
-from app.core.db import BaseModel
-from sqlalchemy.dialects.postgresql import JSONB
+from app.core.db import BaseModel, rows_fingerprint
+from flask import g, has_request_context
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from sqlalchemy.orm.attributes import set_committed_value
 from enum import Enum
 import importlib
 import logging
@@ -9,8 +12,16 @@ import os
 import sys
 import json
 
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
 logger = logging.getLogger(__name__)
 
+# (plugin id, updated_at) -> compiled config_schema validator, or None if the schema is invalid
+_config_validators = {}
+
 class PluginStatus(Enum):
     """Plugin status enumeration"""
     ACTIVE = 'active'
@@ -64,9 +75,9 @@ class Plugin(BaseModel):
                 logger.info(f"Added plugins directory to sys.path in load(): {plugins_dir}")
                 
             # Log detailed import information for debugging
-            logger.info(f"Attempting to import module: {self.module_path}")
-            logger.info(f"Module attribute: {self.module_attr}")
-            logger.info(f"Current sys.path: {sys.path}")
+            logger.debug("Loading plugin %s:%s", self.module_path, self.module_attr)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Current sys.path: %s", sys.path)
             
             # Import the module
             module = importlib.import_module(self.module_path)
@@ -78,61 +89,153 @@ class Plugin(BaseModel):
                 return plugin_class
             else:
                 logger.error(f"Plugin {self.name} doesn't have {self.module_attr} attribute")
-                self.status = PluginStatus.ERROR.value
-                db.session.commit()
+                self._mark_error()
                 return None
                 
         except Exception as e:
             logger.error(f"Failed to load plugin {self.name}: {str(e)}")
-            self.status = PluginStatus.ERROR.value
-            db.session.commit()
+            self._mark_error()
             return None
     
+    def validate_config(self, config):
+        """Check a tenant configuration against config_schema, raising ValueError on mismatch
+        
+        Skipped when fastjsonschema is not installed or the plugin has no schema.
+        """
+        if fastjsonschema is None or not self.config_schema:
+            return
+        
+        key = (self.id, self.updated_at)
+        if key not in _config_validators:
+            try:
+                validator = fastjsonschema.compile(self.config_schema)
+            except fastjsonschema.JsonSchemaDefinitionException as e:
+                logger.warning(f"Invalid config schema for plugin {self.name}: {str(e)}")
+                validator = None
+            
+            # Drop validators compiled from older versions of this plugin
+            for old_key in [k for k in _config_validators if k[0] == self.id]:
+                _config_validators.pop(old_key, None)
+            _config_validators[key] = validator
+        
+        validator = _config_validators[key]
+        if validator is not None:
+            try:
+                validator(config)
+            except fastjsonschema.JsonSchemaValueException as e:
+                raise ValueError(e.message)
+    
+    def _mark_error(self):
+        """Persist ERROR status without committing the caller's session"""
+        if self.status == PluginStatus.ERROR.value:
+            return
+        
+        try:
+            # Separate short-lived transaction so pending changes in the
+            # request session are neither flushed nor committed here
+            with db.engine.begin() as connection:
+                connection.execute(
+                    Plugin.__table__.update()
+                    .where(Plugin.__table__.c.id == self.id)
+                    .values(status=PluginStatus.ERROR.value)
+                )
+            set_committed_value(self, 'status', PluginStatus.ERROR.value)
+        except Exception as e:
+            logger.error(f"Failed to record error status for plugin {self.name}: {str(e)}")
+    
+    @staticmethod
+    def summary_query():
+        """Query the columns plugin listings show, as plain rows rather than Plugin objects"""
+        return db.session.query(
+            Plugin.id, Plugin.name, Plugin.slug, Plugin.version, Plugin.description,
+            Plugin.author, Plugin.homepage, Plugin.status, Plugin.is_system, Plugin.enabled_for_all
+        )
+    
+    @staticmethod
+    def catalog_etag():
+        """Fingerprint of the plugins table that changes on any insert, update or delete"""
+        return rows_fingerprint(Plugin)
+    
+    @staticmethod
+    def get_plugin_by_slug(slug):
+        """Get plugin by slug, reusing the lookup for the rest of the request"""
+        stmt = select(Plugin).where(Plugin.slug == slug)
+        if not has_request_context():
+            return db.session.execute(stmt).scalar_one_or_none()
+        
+        plugins_by_slug = g.setdefault('plugins_by_slug', {})
+        if slug not in plugins_by_slug:
+            plugins_by_slug[slug] = db.session.execute(stmt).scalar_one_or_none()
+        return plugins_by_slug[slug]
+    
     @staticmethod
     def register_plugin(name, slug, version, entry_point, description=None, 
                         author=None, homepage=None, config_schema=None,
                         is_system=False, enabled_for_all=False):
-        """Register a new plugin"""
-        # Check if plugin already exists
-        existing_plugin = Plugin.query.filter_by(slug=slug).first()
-        if existing_plugin:
-            # Update existing plugin
-            existing_plugin.name = name
-            existing_plugin.version = version
-            existing_plugin.description = description
-            existing_plugin.author = author
-            existing_plugin.homepage = homepage
-            existing_plugin.entry_point = entry_point
-            existing_plugin.config_schema = config_schema or {}
-            existing_plugin.is_system = is_system
-            existing_plugin.enabled_for_all = enabled_for_all
-            
-            db.session.commit()
-            logger.info(f"Updated plugin: {name} v{version}")
-            return existing_plugin
+        """Register a new plugin or update an existing one with the same slug"""
+        return Plugin.register_plugins([{
+            'name': name,
+            'slug': slug,
+            'version': version,
+            'entry_point': entry_point,
+            'description': description,
+            'author': author,
+            'homepage': homepage,
+            'config_schema': config_schema,
+            'is_system': is_system,
+            'enabled_for_all': enabled_for_all
+        }])[0]
+    
+    @staticmethod
+    def register_plugins(records):
+        """Register or update several plugins in one statement and one commit
         
-        # Create new plugin
-        plugin = Plugin(
-            name=name,
-            slug=slug,
-            version=version,
-            description=description,
-            author=author,
-            homepage=homepage,
-            entry_point=entry_point,
-            config_schema=config_schema or {},
-            is_system=is_system,
-            enabled_for_all=enabled_for_all,
-            status=PluginStatus.INACTIVE.value
-        )
+        Each record takes the same keys as register_plugin's arguments.
+        Returns the Plugin objects in record order.
+        """
+        # A single INSERT may not touch the same slug twice; last record wins
+        rows = {}
+        for record in records:
+            rows[record['slug']] = {
+                'name': record['name'],
+                'slug': record['slug'],
+                'version': record['version'],
+                'entry_point': record['entry_point'],
+                'description': record.get('description'),
+                'author': record.get('author'),
+                'homepage': record.get('homepage'),
+                'config_schema': record.get('config_schema') or {},
+                'is_system': record.get('is_system', False),
+                'enabled_for_all': record.get('enabled_for_all', False),
+                'status': PluginStatus.INACTIVE.value
+            }
+        if not rows:
+            return []
+        
+        # INSERT ... ON CONFLICT (slug) DO UPDATE; status is only set for new
+        # plugins so re-registering never resets an active plugin
+        stmt = pg_insert(Plugin).values(list(rows.values()))
+        updates = {
+            column: stmt.excluded[column]
+            for column in ('name', 'version', 'description', 'author', 'homepage',
+                           'entry_point', 'config_schema', 'is_system', 'enabled_for_all')
+        }
+        updates['updated_at'] = db.func.current_timestamp()
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['slug'],
+            set_=updates
+        ).returning(Plugin.id, Plugin.slug)
         
         try:
-            db.session.add(plugin)
+            ids_by_slug = {slug: plugin_id for plugin_id, slug in db.session.execute(stmt)}
             db.session.commit()
-            logger.info(f"Registered plugin: {name} v{version}")
-            return plugin
+            for row in rows.values():
+                logger.info(f"Registered plugin: {row['name']} v{row['version']}")
+            
+            plugins = {p.id: p for p in Plugin.query.filter(Plugin.id.in_(ids_by_slug.values()))}
+            return [plugins[ids_by_slug[record['slug']]] for record in records]
             
         except Exception as e:
             db.session.rollback()
-            logger.error(f"Error registering plugin {name}: {str(e)}")
-            raise
\ No newline at end of file
+            logger.error(f"Error registering plugins {', '.join(rows)}: {str(e)}")
+            raise
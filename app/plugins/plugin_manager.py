@@ -2,42 +2,90 @@
 from app import db
 from app.plugins.plugin import Plugin, PluginStatus
 from app.plugins.tenant_plugin import TenantPlugin
-from app.tenant.tenant import Tenant
-import importlib
-import pkgutil
+from app.core.cache import LRUCache
+from flask import current_app
+from sqlalchemy import and_, or_
 import logging
 import os
 import sys
-import inspect
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# Seconds a tenant's plugin config is reused before re-reading tenant_plugins
+TENANT_CONFIG_TTL = 60
+
+# Maximum number of (plugin, tenant) instances kept alive at once
+PLUGIN_INSTANCE_CACHE_SIZE = 2048
+
+# Plain status strings, so hot paths skip the enum .value lookup
+_ACTIVE = PluginStatus.ACTIVE.value
+_INACTIVE = PluginStatus.INACTIVE.value
+
 class PluginManager:
     """Manages plugin discovery, registration, and lifecycle"""
     
     _instance = None
     _initialized = False
     
+    # Guards singleton creation and the shared caches below
+    _lock = threading.RLock()
+    
+    # Plugin packages already imported by discover_plugins, keyed by name
+    _module_cache = {}
+    
     def __new__(cls):
         """Singleton pattern implementation"""
         if cls._instance is None:
-            cls._instance = super(PluginManager, cls).__new__(cls)
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(PluginManager, cls).__new__(cls)
         return cls._instance
     
     def __init__(self):
         """Initialize the plugin manager"""
         if self._initialized:
             return
+        
+        with self._lock:
+            if self._initialized:
+                return
             
-        self.plugins = {}
-        self.plugin_instances = {}
-        self._load_all_plugins()
-        self._initialized = True
+            self.plugins = {}
+            # (slug, tenant_id) -> instance; tenant_id is None for the global instance
+            self.plugin_instances = LRUCache(PLUGIN_INSTANCE_CACHE_SIZE)
+            # (tenant_id, plugin_id) -> (expires_at, config or None if not enabled)
+            self._tenant_config_cache = {}
+            # (slug, version) -> plugin class returned by Plugin.load()
+            self._plugin_class_cache = {}
+            # (fingerprint, discovered metadata) from the last discover_plugins scan
+            self._discovery_cache = (None, [])
+            self._load_all_plugins()
+            self._initialized = True
     
     def _load_all_plugins(self):
         """Load all registered plugins from the database"""
-        for plugin in Plugin.query.all():
-            self.plugins[plugin.slug] = plugin
+        self.plugins = {plugin.slug: plugin for plugin in Plugin.query.all()}
+        self._plugin_ids = {slug: plugin.id for slug, plugin in self.plugins.items()}
+    
+    def _get_plugin(self, plugin_slug):
+        """Get a plugin bound to the current session, preferring a primary-key lookup
+        
+        The slug -> id index lets session.get() answer from the identity map
+        when the plugin was already loaded in this request.
+        """
+        plugin_id = self._plugin_ids.get(plugin_slug)
+        if plugin_id is not None:
+            plugin = db.session.get(Plugin, plugin_id)
+            if plugin is not None and plugin.slug == plugin_slug:
+                return plugin
+        
+        plugin = Plugin.query.filter_by(slug=plugin_slug).first()
+        if plugin:
+            self.plugins[plugin_slug] = plugin
+            self._plugin_ids[plugin_slug] = plugin.id
+        return plugin
     
     # def discover_plugins(self, plugins_dir='plugins'):
     #     """Discover plugins in the specified directory"""
@@ -113,213 +161,292 @@ class PluginManager:
         
     #     logger.info(f"Discovered {len(discovered)} plugins: {[m.get('name') for m in discovered if isinstance(m, dict) and 'name' in m]}")
     #     return discovered
-    def discover_plugins(self, plugins_dir='plugins'):
-        """Discover plugins in the specified directory"""
-        logger.info(f"Discovering plugins in {plugins_dir}")
+    def discover_plugins(self, plugins_dir='plugins', force=False):
+        """Discover plugins in the specified directory
+        
+        Unless force is set, the previous result is returned when no plugin
+        package has changed on disk since the last scan.
+        """
+        # Only needed here, so kept out of the module import path
+        import importlib
+        import traceback
+        
+        logger.info("Discovering plugins in %s", plugins_dir)
         
         # Get absolute path to plugins directory
         if not os.path.isabs(plugins_dir):
             base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
             plugins_dir = os.path.join(base_dir, plugins_dir)
         
-        logger.info(f"Using plugins directory: {plugins_dir}")
+        logger.info("Using plugins directory: %s", plugins_dir)
         
         # Check if directory exists
         if not os.path.exists(plugins_dir):
             logger.error(f"Plugins directory does not exist: {plugins_dir}")
             return []
         
-        # Log directory contents for debugging
-        logger.info(f"Contents of {plugins_dir}:")
+        # List the directory once; scandir entries carry their file type
         try:
-            for item in os.listdir(plugins_dir):
-                logger.info(f"  - {item}")
+            with os.scandir(plugins_dir) as it:
+                entries = list(it)
         except Exception as e:
             logger.error(f"Error listing directory contents: {str(e)}")
+            return []
+        
+        # Log directory contents for debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Contents of %s: %s", plugins_dir, [e.name for e in entries])
         
         # Add plugins directory to Python path if not already there
         if plugins_dir not in sys.path:
             sys.path.insert(0, plugins_dir)
-            logger.info(f"Added {plugins_dir} to Python path")
+            logger.info("Added %s to Python path", plugins_dir)
+        
+        # Skip the import/setup/register pass if nothing changed since last time
+        fingerprint = self._discovery_fingerprint(plugins_dir, entries)
+        cached_fingerprint, cached_discovered = self._discovery_cache
+        if not force and fingerprint == cached_fingerprint:
+            logger.info("Plugins directory unchanged, reusing %s discovered plugins", len(cached_discovered))
+            return list(cached_discovered)
         
         # Discover plugin modules
         discovered = []
-        # Rest of the function remains the same...
-        for item in os.listdir(plugins_dir):
-            item_path = os.path.join(plugins_dir, item)
+        records = []
+        for entry in entries:
+            item = entry.name
             
             # Check if it's a directory (plugin package)
-            if os.path.isdir(item_path) and os.path.exists(os.path.join(item_path, '__init__.py')):
+            if entry.is_dir(follow_symlinks=False) and os.path.exists(os.path.join(entry.path, '__init__.py')):
                 try:
-                    logger.info(f"Found potential plugin package: {item}")
+                    logger.info("Found potential plugin package: %s", item)
                     
                     # Try to import the plugin package
                     # Fix: Use proper import name - the directory name should be the import name
-                    plugin_module = importlib.import_module(item)
+                    plugin_module = self._module_cache.get(item)
+                    if plugin_module is None:
+                        plugin_module = importlib.import_module(item)
+                        self._module_cache[item] = plugin_module
                     
                     # Check if it has a setup function
-                    if hasattr(plugin_module, 'setup'):
-                        logger.info(f"Module {item} has setup function")
+                    setup = getattr(plugin_module, 'setup', None)
+                    if setup is not None:
+                        logger.info("Module %s has setup function", item)
                         try:
-                            metadata = plugin_module.setup()
+                            metadata = setup()
                             if metadata:
                                 discovered.append(metadata)
                                 
-                                # Register or update the plugin
-                                plugin = Plugin.register_plugin(
-                                    name=metadata.get('name', item),
-                                    slug=metadata.get('slug', item.lower()),
-                                    version=metadata.get('version', '0.1.0'),
-                                    entry_point=metadata.get('entry_point', f"{item}:plugin"),
-                                    description=metadata.get('description'),
-                                    author=metadata.get('author'),
-                                    homepage=metadata.get('homepage'),
-                                    config_schema=metadata.get('config_schema'),
-                                    is_system=metadata.get('is_system', False),
-                                    enabled_for_all=metadata.get('enabled_for_all', False)
-                                )
-                                logger.info(f"Successfully registered plugin: {metadata.get('name', item)}")
+                                # Queue the plugin for registration below
+                                records.append({
+                                    'name': metadata.get('name', item),
+                                    'slug': metadata.get('slug', item.lower()),
+                                    'version': metadata.get('version', '0.1.0'),
+                                    'entry_point': metadata.get('entry_point', f"{item}:plugin"),
+                                    'description': metadata.get('description'),
+                                    'author': metadata.get('author'),
+                                    'homepage': metadata.get('homepage'),
+                                    'config_schema': metadata.get('config_schema'),
+                                    'is_system': metadata.get('is_system', False),
+                                    'enabled_for_all': metadata.get('enabled_for_all', False)
+                                })
                             else:
                                 logger.warning(f"Plugin {item} setup() function returned no metadata")
                         except Exception as e:
                             logger.error(f"Error in setup() function for {item}: {str(e)}")
-                            import traceback
                             logger.error(f"Traceback: {traceback.format_exc()}")
                     else:
                         logger.warning(f"Module {item} does not have a setup function")
                         
                 except Exception as e:
                     logger.error(f"Error loading plugin {item}: {str(e)}")
-                    import traceback
                     logger.error(f"Traceback: {traceback.format_exc()}")
         
+        # Register or update every discovered plugin in one transaction
+        if records:
+            try:
+                Plugin.register_plugins(records)
+                logger.info("Successfully registered plugins: %s", [r['name'] for r in records])
+            except Exception as e:
+                logger.error(f"Error registering discovered plugins: {str(e)}")
+                logger.error(f"Traceback: {traceback.format_exc()}")
+        
         # Reload plugins from the database
         self._load_all_plugins()
+        self._discovery_cache = (fingerprint, list(discovered))
 
-        logger.info(f"Discovered {len(discovered)} plugins")
+        logger.info("Discovered %s plugins", len(discovered))
         return discovered
     
-    def activate_plugin(self, plugin_slug):
-        """Activate a plugin"""
-        plugin = Plugin.query.filter_by(slug=plugin_slug).first()
+    @staticmethod
+    def _discovery_fingerprint(plugins_dir, entries):
+        """Modification times of every plugin package plus the interpreter environment"""
+        packages = []
+        for entry in entries:
+            init_path = os.path.join(entry.path, '__init__.py')
+            if entry.is_dir(follow_symlinks=False) and os.path.exists(init_path):
+                packages.append((entry.name, entry.stat().st_mtime_ns, os.stat(init_path).st_mtime_ns))
+        return (plugins_dir, sys.prefix, tuple(sys.path), tuple(sorted(packages)))
+    
+    @classmethod
+    def clear_module_cache(cls):
+        """Forget imported plugin packages so the next discovery re-imports them"""
+        cls._module_cache.clear()
+    
+    def activate_plugin(self, plugin_slug, commit=True):
+        """Activate a plugin; with commit=False the status change is left to the caller's commit"""
+        plugin = self._get_plugin(plugin_slug)
         if not plugin:
             logger.error(f"Plugin {plugin_slug} not found")
             return False
         
         try:
             # Log the current status
-            logger.info(f"Activating plugin {plugin_slug}. Current status: {plugin.status}")
+            logger.info("Activating plugin %s. Current status: %s", plugin_slug, plugin.status)
             
-            # Test that we can load the plugin first
-            plugin_class = plugin.load()
+            # Test that we can load the plugin first, bypassing the class cache
+            self._forget_plugin_class(plugin_slug)
+            plugin_class = self._load_plugin_class(plugin)
             if not plugin_class:
                 logger.error(f"Failed to load plugin {plugin_slug}")
                 return False
             
+            # Drop configs and instances cached while the plugin was inactive
+            self.invalidate_tenant_config(plugin_id=plugin.id)
+            
             # Initialize plugin instance but don't try to register blueprint
             try:
                 instance = plugin_class()
                 
                 # Store the instance for later use
-                self.plugin_instances[plugin_slug] = instance
+                with self._lock:
+                    self.plugin_instances[(plugin_slug, None)] = instance
                 
                 # Log the successful initialization
-                logger.info(f"Successfully initialized plugin {plugin_slug}")
+                logger.info("Successfully initialized plugin %s", plugin_slug)
             except Exception as e:
                 logger.error(f"Error initializing plugin {plugin_slug}: {str(e)}")
                 return False
                 
             # Update status and immediately commit
-            plugin.status = PluginStatus.ACTIVE.value
-            db.session.commit()
+            plugin.status = _ACTIVE
+            if commit:
+                db.session.commit()
             
-            logger.info(f"Activated plugin: {plugin.name}")
+            logger.info("Activated plugin: %s", plugin.name)
             self.plugins[plugin_slug] = plugin  # Update the cached plugin in the manager
             return True
         except Exception as e:
-            db.session.rollback()
+            if commit:
+                db.session.rollback()
             logger.error(f"Error activating plugin {plugin_slug}: {str(e)}")
             return False
 
-    def deactivate_plugin(self, plugin_slug):
-        """Deactivate a plugin"""
-        plugin = Plugin.query.filter_by(slug=plugin_slug).first()
+    def deactivate_plugin(self, plugin_slug, commit=True):
+        """Deactivate a plugin; with commit=False the status change is left to the caller's commit"""
+        plugin = self._get_plugin(plugin_slug)
         if not plugin:
             logger.error(f"Plugin {plugin_slug} not found")
             return False
         
         try:
             # Unregister blueprint if possible
-            from flask import current_app
             blueprint_name = f"{plugin_slug}_blueprint"
             if blueprint_name in current_app.blueprints:
                 # Flask doesn't have a built-in way to unregister blueprints,
                 # but we can mark the plugin as inactive so it won't be used
-                logger.info(f"Marking blueprint {blueprint_name} as inactive")
+                logger.info("Marking blueprint %s as inactive", blueprint_name)
             
-            plugin.status = PluginStatus.INACTIVE.value
-            db.session.commit()
+            plugin.status = _INACTIVE
+            if commit:
+                db.session.commit()
             
-            # Reload plugin and verify status
-            db.session.refresh(plugin)
-            if plugin.status != PluginStatus.INACTIVE.value:
-                logger.error(f"Failed to update plugin status. Expected {PluginStatus.INACTIVE.value}, got {plugin.status}")
-                return False
-                    
-            logger.info(f"Deactivated plugin: {plugin.name}")
+            logger.info("Deactivated plugin: %s", plugin.name)
             
             # Remove any instances
-            if plugin_slug in self.plugin_instances:
-                del self.plugin_instances[plugin_slug]
+            with self._lock:
+                self.plugin_instances.pop((plugin_slug, None), None)
+            self._forget_plugin_class(plugin_slug)
             
             # Update the cached plugin
             self.plugins[plugin_slug] = plugin
             
+            # Forget tenant configs and per-tenant instances for this plugin
+            self.invalidate_tenant_config(plugin_id=plugin.id)
+            
             return True
         except Exception as e:
-            db.session.rollback()
+            if commit:
+                db.session.rollback()
             logger.error(f"Error deactivating plugin {plugin_slug}: {str(e)}")
             return False
     
+    def set_plugins_active(self, plugin_slugs, active):
+        """Activate or deactivate several plugins with a single commit
+        
+        Returns a map of slug -> success; nothing is applied if the commit fails.
+        """
+        # Load all requested plugins in one query so the per-plugin lookups
+        # below are answered from the identity map
+        for plugin in Plugin.query.filter(Plugin.slug.in_(plugin_slugs)).all():
+            self.plugins[plugin.slug] = plugin
+            self._plugin_ids[plugin.slug] = plugin.id
+        
+        toggle = self.activate_plugin if active else self.deactivate_plugin
+        results = {slug: toggle(slug, commit=False) for slug in plugin_slugs}
+        
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error committing bulk plugin status change: {str(e)}")
+            
+            # Drop instances and classes cached for the rolled-back activations
+            for slug in plugin_slugs:
+                with self._lock:
+                    self.plugin_instances.pop((slug, None), None)
+                self._forget_plugin_class(slug)
+            return {slug: False for slug in plugin_slugs}
+        
+        return results
     
-    def get_plugin_instance(self, plugin_slug, tenant_id=None):
-        """Get an instance of the plugin for a specific tenant"""
+    
+    def get_plugin_instance(self, plugin_slug, tenant_id=None, config_map=None):
+        """Get an instance of the plugin for a specific tenant
+        
+        config_map, if given, is the result of _load_tenant_configs(tenant_id)
+        and is used instead of querying the tenant's plugin row.
+        """
         # Check if we already have an instance
-        instance_key = f"{plugin_slug}:{tenant_id}" if tenant_id else plugin_slug
-        if instance_key in self.plugin_instances:
-            return self.plugin_instances[instance_key]
+        instance_key = (plugin_slug, tenant_id)
+        with self._lock:
+            if instance_key in self.plugin_instances:
+                return self.plugin_instances[instance_key]
         
         # Get the plugin
-        plugin = self.plugins.get(plugin_slug)
+        plugin = self._get_plugin(plugin_slug)
         if not plugin:
-            # Try to get from database directly
-            plugin = Plugin.query.filter_by(slug=plugin_slug).first()
-            if plugin:
-                self.plugins[plugin_slug] = plugin
-            else:
-                logger.error(f"Plugin {plugin_slug} not found")
-                return None
+            logger.error(f"Plugin {plugin_slug} not found")
+            return None
         
-        if plugin.status != PluginStatus.ACTIVE.value:
+        if plugin.status != _ACTIVE:
             logger.error(f"Plugin {plugin_slug} is not active. Current status: {plugin.status}")
             return None
         
         # Load the plugin
-        plugin_class = plugin.load()
+        plugin_class = self._load_plugin_class(plugin)
         if not plugin_class:
             return None
         
         # Get tenant-specific configuration if applicable
         config = {}
         if tenant_id:
-            tenant_plugin = TenantPlugin.query.filter_by(
-                tenant_id=tenant_id,
-                plugin_id=plugin.id,
-                enabled=True
-            ).first()
+            if config_map is None:
+                tenant_config = self._get_tenant_config(tenant_id, plugin.id)
+            else:
+                tenant_config = config_map.get(plugin.id)
             
-            if tenant_plugin:
-                config = tenant_plugin.config
+            if tenant_config is not None:
+                config = tenant_config
             elif not plugin.enabled_for_all:
                 logger.warning(f"Plugin {plugin_slug} is not enabled for tenant {tenant_id}")
                 return None
@@ -327,7 +454,8 @@ class PluginManager:
         # Create an instance
         try:
             instance = plugin_class(config)
-            self.plugin_instances[instance_key] = instance
+            with self._lock:
+                self.plugin_instances[instance_key] = instance
             return instance
         except Exception as e:
             logger.error(f"Error instantiating plugin {plugin_slug}: {str(e)}")
@@ -335,69 +463,145 @@ class PluginManager:
             logger.error(f"Traceback: {traceback.format_exc()}")
             return None
 
-    def get_tenant_plugins(self, tenant_id):
-        """Get all active plugins for a specific tenant"""
-        # Get system-wide plugins that are enabled for all tenants
-        system_plugins = Plugin.query.filter_by(
-            status=PluginStatus.ACTIVE.value,
-            enabled_for_all=True
-        ).all()
+    def set_plugin_instance(self, plugin_slug, instance):
+        """Cache an already constructed global (tenant-less) plugin instance"""
+        with self._lock:
+            self.plugin_instances[(plugin_slug, None)] = instance
+
+    def _load_plugin_class(self, plugin):
+        """Get the plugin class, importing it only the first time per version"""
+        key = (plugin.slug, plugin.version)
+        plugin_class = self._plugin_class_cache.get(key)
+        if plugin_class is None:
+            plugin_class = plugin.load()
+            if plugin_class:
+                self._plugin_class_cache[key] = plugin_class
+        return plugin_class
+    
+    def _forget_plugin_class(self, plugin_slug):
+        """Drop cached plugin classes for a slug"""
+        with self._lock:
+            for key in [k for k in self._plugin_class_cache if k[0] == plugin_slug]:
+                self._plugin_class_cache.pop(key, None)
+    
+    def _get_tenant_config(self, tenant_id, plugin_id):
+        """Get a tenant's config for a plugin, or None if it is not enabled"""
+        key = (tenant_id, plugin_id)
+        cached = self._tenant_config_cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
         
-        # Get tenant-specific plugins
-        tenant_plugins = TenantPlugin.query.filter_by(
+        tenant_plugin = TenantPlugin.query.filter_by(
             tenant_id=tenant_id,
+            plugin_id=plugin_id,
             enabled=True
-        ).join(Plugin).filter(
-            Plugin.status == PluginStatus.ACTIVE.value
-        ).all()
-        
-        # Combine the results (exclude duplicates)
-        system_plugin_ids = {p.id for p in system_plugins}
-        result = list(system_plugins)
+        ).first()
+        config = (tenant_plugin.config or {}) if tenant_plugin else None
         
-        for tp in tenant_plugins:
-            if tp.plugin_id not in system_plugin_ids:
-                result.append(tp.plugin)
-        
-        return result
+        self._tenant_config_cache[key] = (time.monotonic() + TENANT_CONFIG_TTL, config)
+        return config
+    
+    def invalidate_tenant_config(self, tenant_id=None, plugin_id=None):
+        """Forget cached tenant configs and instances matching tenant and/or plugin"""
+        with self._lock:
+            for key in list(self._tenant_config_cache):
+                if (tenant_id is None or key[0] == tenant_id) and \
+                        (plugin_id is None or key[1] == plugin_id):
+                    self._tenant_config_cache.pop(key, None)
+            
+            # Instances were built from the old config, so drop them too
+            slugs = None
+            if plugin_id is not None:
+                slugs = {slug for slug, pid in self._plugin_ids.items() if pid == plugin_id}
+            for key in list(self.plugin_instances):
+                slug, key_tenant = key
+                if slugs is not None and slug not in slugs:
+                    continue
+                if tenant_id is not None and key_tenant != tenant_id:
+                    continue
+                self.plugin_instances.pop(key, None)
+    
+    def _load_tenant_configs(self, tenant_id):
+        """Map plugin id to config for every plugin enabled for a tenant, in one query"""
+        rows = db.session.query(TenantPlugin.plugin_id, TenantPlugin.config).filter(
+            TenantPlugin.tenant_id == tenant_id,
+            TenantPlugin.enabled == True
+        ).all()
+        return {plugin_id: config or {} for plugin_id, config in rows}
+    
+    def get_tenant_plugins(self, tenant_id):
+        """Get all active plugins for a specific tenant"""
+        return self._tenant_plugins_query(tenant_id, Plugin).all()
+    
+    def get_tenant_plugins_with_config(self, tenant_id):
+        """Get (plugin, tenant config or None) pairs for a tenant's active plugins"""
+        return self._tenant_plugins_query(tenant_id, Plugin, TenantPlugin.config).all()
+    
+    def _tenant_plugins_query(self, tenant_id, *entities):
+        """Query the given entities for a tenant's active plugins"""
+        # System-wide plugins enabled for all tenants plus plugins enabled
+        # for this tenant, in one query. The unique (tenant_id, plugin_id)
+        # constraint means the outer join yields at most one row per plugin.
+        return db.session.query(*entities).outerjoin(
+            TenantPlugin,
+            and_(
+                TenantPlugin.plugin_id == Plugin.id,
+                TenantPlugin.tenant_id == tenant_id
+            )
+        ).filter(
+            Plugin.status == _ACTIVE,
+            or_(
+                Plugin.enabled_for_all == True,
+                TenantPlugin.enabled == True
+            )
+        ).order_by(Plugin.enabled_for_all.desc(), Plugin.id)
 
     def load_plugin_blueprints(self, app):
         """Load and register blueprints for all active plugins"""
         try:
-            from app.plugins.plugin import Plugin, PluginStatus
-            
             # Get all active plugins
-            active_plugins = Plugin.query.filter_by(status=PluginStatus.ACTIVE.value).all()
+            active_plugins = Plugin.query.filter_by(status=_ACTIVE).all()
             
             for plugin in active_plugins:
+                # Already constructed and registered during app start-up
+                if (plugin.slug, None) in self.plugin_instances:
+                    continue
+                
                 # Get plugin instance
                 instance = self.get_plugin_instance(plugin.slug)
                 
-                if instance and hasattr(instance, 'get_blueprint'):
-                    blueprint = instance.get_blueprint()
+                get_blueprint = getattr(instance, 'get_blueprint', None) if instance else None
+                if get_blueprint is not None:
+                    blueprint = get_blueprint()
                     
                     if blueprint and blueprint.name not in app.blueprints:
                         app.register_blueprint(blueprint)
-                        app.logger.info(f"Registered blueprint for plugin {plugin.slug}")
+                        app.logger.info("Registered blueprint for plugin %s", plugin.slug)
         except Exception as e:
             app.logger.error(f"Error loading plugin blueprints: {str(e)}")
-
-def get_tenant_plugin_menu_items(self, tenant_id):
-    """Get menu items for all active plugins for a tenant"""
-    menu_items = []
     
-    # Get all active plugins for this tenant
-    plugins = self.get_tenant_plugins(tenant_id)
-    
-    for plugin in plugins:
-        # Get plugin instance
-        instance = self.get_plugin_instance(plugin.slug, tenant_id)
-        if instance and hasattr(instance, 'get_menu_items'):
-            try:
-                items = instance.get_menu_items()
-                if items:
-                    menu_items.extend(items)
-            except Exception as e:
-                logger.error(f"Error getting menu items for plugin {plugin.slug}: {str(e)}")
-    
-    return menu_items
\ No newline at end of file
+    def get_tenant_plugin_menu_items(self, tenant_id):
+        """Get menu items for all active plugins for a tenant"""
+        menu_items = []
+        extend = menu_items.extend
+        get_plugin_instance = self.get_plugin_instance
+        
+        # Load every tenant config up front rather than once per plugin
+        config_map = self._load_tenant_configs(tenant_id)
+        
+        # Get all active plugins for this tenant
+        plugins = self.get_tenant_plugins(tenant_id)
+        
+        for plugin in plugins:
+            # Get plugin instance
+            instance = get_plugin_instance(plugin.slug, tenant_id, config_map)
+            get_menu_items = getattr(instance, 'get_menu_items', None) if instance else None
+            if get_menu_items is not None:
+                try:
+                    items = get_menu_items()
+                    if items:
+                        extend(items)
+                except Exception as e:
+                    logger.error(f"Error getting menu items for plugin {plugin.slug}: {str(e)}")
+        
+        return menu_items
@@ -1,15 +1,19 @@
 """API endpoints for plugin management"""
-from flask import Blueprint, request, jsonify, g, current_app
+from flask import Blueprint, Response, request, g, current_app
 from app import db
 from app.plugins.plugin import Plugin, PluginStatus
 from app.plugins.tenant_plugin import TenantPlugin
 from app.plugins.plugin_manager import PluginManager
 from app.auth.rbac import permission_required, system_admin_required
 from app.tenant.middleware import tenant_required, get_current_tenant
+from app.core.json_response import dumps, ojsonify
 import logging
 
 logger = logging.getLogger(__name__)
 
+# (etag, encoded body) of the last plugin catalog served by list_plugins
+_catalog_cache = (None, None)
+
 # Create blueprint
 plugin_api = Blueprint('plugin_api', __name__, url_prefix='/api/plugins')
 
@@ -17,28 +21,28 @@ plugin_api = Blueprint('plugin_api', __name__, url_prefix='/api/plugins')
 @permission_required('view_plugins')
 def list_plugins():
     """List all available plugins"""
-    # Get all plugins
-    plugins = Plugin.query.all()
-    result = []
+    global _catalog_cache
     
-    for plugin in plugins:
-        result.append({
-            'id': plugin.id,
-            'name': plugin.name,
-            'slug': plugin.slug,
-            'version': plugin.version,
-            'description': plugin.description,
-            'author': plugin.author,
-            'homepage': plugin.homepage,
-            'status': plugin.status,
-            'is_system': plugin.is_system,
-            'enabled_for_all': plugin.enabled_for_all
-        })
+    # The catalog only changes on discover/activate/deactivate and flag
+    # toggles, so let clients revalidate against a cheap fingerprint
+    etag = Plugin.catalog_etag()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        cached_etag, body = _catalog_cache
+        if cached_etag != etag:
+            # Get all plugins as plain rows
+            result = [dict(row._mapping) for row in Plugin.summary_query()]
+            body = dumps({
+                'status': 'success',
+                'data': result
+            })
+            _catalog_cache = (etag, body)
+        response = Response(body, mimetype='application/json')
     
-    return jsonify({
-        'status': 'success',
-        'data': result
-    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @plugin_api.route('/tenant', methods=['GET'])
 @permission_required('view_plugins')
@@ -48,23 +52,17 @@ def list_tenant_plugins():
     tenant = get_current_tenant()
     
     if not tenant:
-        return jsonify({
+        return ojsonify({
             'status': 'error',
             'message': "No tenant context found"
         }), 404
     
-    # Get plugins for tenant
+    # Get plugins for tenant along with their tenant configuration
     plugin_manager = PluginManager()
-    plugins = plugin_manager.get_tenant_plugins(tenant.id)
+    rows = plugin_manager.get_tenant_plugins_with_config(tenant.id)
     
     result = []
-    for plugin in plugins:
-        # Get tenant-specific configuration
-        tenant_plugin = TenantPlugin.query.filter_by(
-            tenant_id=tenant.id,
-            plugin_id=plugin.id
-        ).first()
-        
+    for plugin, config in rows:
         result.append({
             'id': plugin.id,
             'name': plugin.name,
@@ -74,10 +72,10 @@ def list_tenant_plugins():
             'author': plugin.author,
             'status': plugin.status,
             'enabled': True,
-            'config': tenant_plugin.config if tenant_plugin else {}
+            'config': config or {}
         })
     
-    return jsonify({
+    return ojsonify({
         'status': 'success',
         'data': result
     })
@@ -87,9 +85,9 @@ def list_tenant_plugins():
 def discover_plugins():
     """Discover and register new plugins"""
     plugin_manager = PluginManager()
-    discovered = plugin_manager.discover_plugins()
+    discovered = plugin_manager.discover_plugins(force=request.args.get('force') == '1')
     
-    return jsonify({
+    return ojsonify({
         'status': 'success',
         'message': f"Discovered {len(discovered)} plugins",
         'data': discovered
@@ -103,12 +101,12 @@ def activate_plugin(slug):
     success = plugin_manager.activate_plugin(slug)
     
     if success:
-        return jsonify({
+        return ojsonify({
             'status': 'success',
             'message': f"Plugin '{slug}' activated successfully"
         })
     else:
-        return jsonify({
+        return ojsonify({
             'status': 'error',
             'message': f"Failed to activate plugin '{slug}'"
         }), 400
@@ -121,16 +119,51 @@ def deactivate_plugin(slug):
     success = plugin_manager.deactivate_plugin(slug)
     
     if success:
-        return jsonify({
+        return ojsonify({
             'status': 'success',
             'message': f"Plugin '{slug}' deactivated successfully"
         })
     else:
-        return jsonify({
+        return ojsonify({
             'status': 'error',
             'message': f"Failed to deactivate plugin '{slug}'"
         }), 400
 
+@plugin_api.route('/bulk/<action>', methods=['POST'])
+@system_admin_required
+def bulk_set_plugin_status(action):
+    """Activate or deactivate several plugins in one request"""
+    if action not in ('activate', 'deactivate'):
+        return ojsonify({
+            'status': 'error',
+            'message': f"Unknown bulk action '{action}'"
+        }), 404
+    
+    data = request.get_json() or {}
+    slugs = data.get('slugs')
+    if not slugs or not isinstance(slugs, list) or not all(isinstance(slug, str) for slug in slugs):
+        return ojsonify({
+            'status': 'error',
+            'message': "A non-empty list of plugin slugs is required"
+        }), 400
+    
+    plugin_manager = PluginManager()
+    results = plugin_manager.set_plugins_active(list(dict.fromkeys(slugs)), action == 'activate')
+    
+    failed = [slug for slug, success in results.items() if not success]
+    if failed:
+        return ojsonify({
+            'status': 'error',
+            'message': f"Failed to {action} plugins: {', '.join(failed)}",
+            'data': results
+        }), 400
+    
+    return ojsonify({
+        'status': 'success',
+        'message': f"{len(results)} plugins {action}d successfully",
+        'data': results
+    })
+
 @plugin_api.route('/tenant/<plugin_slug>/enable', methods=['POST'])
 @permission_required('install_plugin')
 @tenant_required
@@ -139,22 +172,22 @@ def enable_for_tenant(plugin_slug):
     tenant = get_current_tenant()
     
     if not tenant:
-        return jsonify({
+        return ojsonify({
             'status': 'error',
             'message': "No tenant context found"
         }), 404
     
     # Get the plugin
-    plugin = Plugin.query.filter_by(slug=plugin_slug).first()
+    plugin = Plugin.get_plugin_by_slug(plugin_slug)
     if not plugin:
-        return jsonify({
+        return ojsonify({
             'status': 'error',
             'message': f"Plugin '{plugin_slug}' not found"
         }), 404
     
     # Check if plugin is active
     if plugin.status != PluginStatus.ACTIVE.value:
-        return jsonify({
+        return ojsonify({
             'status': 'error',
             'message': f"Plugin '{plugin_slug}' is not active"
         }), 400
@@ -166,15 +199,16 @@ def enable_for_tenant(plugin_slug):
     try:
         # Enable the plugin for tenant
         TenantPlugin.enable_for_tenant(tenant.id, plugin.id, config)
+        PluginManager().invalidate_tenant_config(tenant.id, plugin.id)
         
-        return jsonify({
+        return ojsonify({
             'status': 'success',
             'message': f"Plugin '{plugin_slug}' enabled for tenant '{tenant.name}'"
         })
         
     except Exception as e:
         logger.error(f"Error enabling plugin: {str(e)}")
-        return jsonify({
+        return ojsonify({
             'status': 'error',
             'message': f"Failed to enable plugin: {str(e)}"
         }), 500
@@ -187,15 +221,15 @@ def disable_for_tenant(plugin_slug):
     tenant = get_current_tenant()
     
     if not tenant:
-        return jsonify({
+        return ojsonify({
             'status': 'error',
             'message': "No tenant context found"
         }), 404
     
     # Get the plugin
-    plugin = Plugin.query.filter_by(slug=plugin_slug).first()
+    plugin = Plugin.get_plugin_by_slug(plugin_slug)
     if not plugin:
-        return jsonify({
+        return ojsonify({
             'status': 'error',
             'message': f"Plugin '{plugin_slug}' not found"
         }), 404
@@ -203,21 +237,22 @@ def disable_for_tenant(plugin_slug):
     try:
         # Disable the plugin for tenant
         success = TenantPlugin.disable_for_tenant(tenant.id, plugin.id)
+        PluginManager().invalidate_tenant_config(tenant.id, plugin.id)
         
         if success:
-            return jsonify({
+            return ojsonify({
                 'status': 'success',
                 'message': f"Plugin '{plugin_slug}' disabled for tenant '{tenant.name}'"
             })
         else:
-            return jsonify({
+            return ojsonify({
                 'status': 'error',
                 'message': f"Plugin '{plugin_slug}' was not enabled for tenant '{tenant.name}'"
             }), 400
         
     except Exception as e:
         logger.error(f"Error disabling plugin: {str(e)}")
-        return jsonify({
+        return ojsonify({
             'status': 'error',
             'message': f"Failed to disable plugin: {str(e)}"
         }), 500
@@ -230,15 +265,15 @@ def update_tenant_plugin_config(plugin_slug):
     tenant = get_current_tenant()
     
     if not tenant:
-        return jsonify({
+        return ojsonify({
             'status': 'error',
             'message': "No tenant context found"
         }), 404
     
     # Get the plugin
-    plugin = Plugin.query.filter_by(slug=plugin_slug).first()
+    plugin = Plugin.get_plugin_by_slug(plugin_slug)
     if not plugin:
-        return jsonify({
+        return ojsonify({
             'status': 'error',
             'message': f"Plugin '{plugin_slug}' not found"
         }), 404
@@ -246,29 +281,30 @@ def update_tenant_plugin_config(plugin_slug):
     # Get configuration from request
     data = request.get_json()
     if not data:
-        return jsonify({
+        return ojsonify({
             'status': 'error',
             'message': "No configuration provided"
         }), 400
     
-    # Get tenant plugin association
-    tenant_plugin = TenantPlugin.query.filter_by(
-        tenant_id=tenant.id,
-        plugin_id=plugin.id
-    ).first()
-    
-    if not tenant_plugin:
-        return jsonify({
+    try:
+        plugin.validate_config(data)
+    except ValueError as e:
+        return ojsonify({
             'status': 'error',
-            'message': f"Plugin '{plugin_slug}' is not enabled for tenant '{tenant.name}'"
+            'message': f"Invalid configuration: {str(e)}"
         }), 400
     
     try:
-        # Update configuration
-        tenant_plugin.config = data
-        db.session.commit()
+        # Update configuration in place
+        if not TenantPlugin.update_config(tenant.id, plugin.id, data):
+            return ojsonify({
+                'status': 'error',
+                'message': f"Plugin '{plugin_slug}' is not enabled for tenant '{tenant.name}'"
+            }), 400
+        
+        PluginManager().invalidate_tenant_config(tenant.id, plugin.id)
         
-        return jsonify({
+        return ojsonify({
             'status': 'success',
             'message': f"Configuration for plugin '{plugin_slug}' updated successfully"
         })
@@ -276,7 +312,7 @@ def update_tenant_plugin_config(plugin_slug):
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error updating plugin configuration: {str(e)}")
-        return jsonify({
+        return ojsonify({
             'status': 'error',
             'message': f"Failed to update plugin configuration: {str(e)}"
         }), 500
\ No newline at end of file
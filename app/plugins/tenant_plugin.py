@@ -1,7 +1,8 @@
 """Tenant-plugin association for managing enabled plugins per tenant"""
 from app import db
 from app.core.db import BaseModel
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import and_, select, update
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,28 +11,35 @@ class TenantPlugin(BaseModel):
     """Tenant-plugin association for managing enabled plugins per tenant"""
     __tablename__ = 'tenant_plugins'
     
-    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id'), nullable=False)
-    plugin_id = db.Column(db.Integer, db.ForeignKey('plugins.id'), nullable=False)
+    tenant_id = db.Column(db.Integer, db.ForeignKey('tenants.id', ondelete='CASCADE'), nullable=False)
+    plugin_id = db.Column(db.Integer, db.ForeignKey('plugins.id', ondelete='CASCADE'), nullable=False)
     
     # Plugin configuration for this tenant
     enabled = db.Column(db.Boolean, default=True)
     config = db.Column(JSONB, default={})
     
-    # Relationships
-    tenant = db.relationship('Tenant', backref=db.backref('plugin_configs', lazy='dynamic'))
-    plugin = db.relationship('Plugin', backref=db.backref('tenant_configs', lazy='dynamic'))
+    # Relationships; the collections load lazily (so eager options work at query
+    # sites) and are left to the database's ON DELETE CASCADE on delete
+    tenant = db.relationship('Tenant', backref=db.backref('plugin_configs', lazy='select', passive_deletes=True))
+    plugin = db.relationship('Plugin', backref=db.backref('tenant_configs', lazy='select', passive_deletes=True))
     
-    # Composite unique constraint
+    # Composite unique constraint, plus partial indexes for the
+    # "enabled rows of a tenant" and "enabled rows of a plugin" lookups
     __table_args__ = (
         db.UniqueConstraint('tenant_id', 'plugin_id', name='uq_tenant_plugin'),
+        db.Index('ix_tp_tenant_enabled', 'tenant_id', postgresql_where=db.text('enabled = true')),
+        db.Index('ix_tp_plugin_enabled', 'plugin_id', postgresql_where=db.text('enabled = true')),
     )
     
     def __repr__(self):
         return f'<TenantPlugin {self.tenant.name} - {self.plugin.name}>'
     
     @staticmethod
-    def enable_for_tenant(tenant_id, plugin_id, config=None):
-        """Enable a plugin for a specific tenant"""
+    def enable_for_tenant(tenant_id, plugin_id, config=None, commit=True):
+        """Enable a plugin for a specific tenant
+        
+        Pass commit=False when enabling in bulk and commit once afterwards.
+        """
         tenant_plugin = TenantPlugin.query.filter_by(
             tenant_id=tenant_id, 
             plugin_id=plugin_id
@@ -52,6 +60,9 @@ class TenantPlugin(BaseModel):
             )
             db.session.add(tenant_plugin)
         
+        if not commit:
+            return tenant_plugin
+        
         try:
             db.session.commit()
             logger.info(f"Enabled plugin (ID: {plugin_id}) for tenant (ID: {tenant_id})")
@@ -63,27 +74,116 @@ class TenantPlugin(BaseModel):
             raise
     
     @staticmethod
-    def disable_for_tenant(tenant_id, plugin_id):
-        """Disable a plugin for a specific tenant"""
-        tenant_plugin = TenantPlugin.query.filter_by(
-            tenant_id=tenant_id, 
-            plugin_id=plugin_id
-        ).first()
+    def disable_for_tenant(tenant_id, plugin_id, commit=True):
+        """Disable a plugin for a specific tenant
         
-        if tenant_plugin:
-            tenant_plugin.enabled = False
+        Pass commit=False when disabling in bulk and commit once afterwards.
+        """
+        # Flip the flag in place; RETURNING tells us whether the row existed
+        result = db.session.execute(
+            update(TenantPlugin).where(
+                TenantPlugin.tenant_id == tenant_id,
+                TenantPlugin.plugin_id == plugin_id
+            ).values(enabled=False, updated_at=db.func.current_timestamp())
+            .returning(TenantPlugin.id),
+            execution_options={'synchronize_session': False}
+        )
+        if result.first() is None:
+            return False
+        
+        if not commit:
+            return True
+        
+        try:
+            db.session.commit()
+            logger.info(f"Disabled plugin (ID: {plugin_id}) for tenant (ID: {tenant_id})")
+            return True
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error disabling plugin: {str(e)}")
+            raise
+    
+    @staticmethod
+    def update_config(tenant_id, plugin_id, config):
+        """Replace a tenant's plugin configuration
+        
+        Returns False if the plugin has no row for the tenant.
+        """
+        result = db.session.execute(
+            update(TenantPlugin).where(
+                TenantPlugin.tenant_id == tenant_id,
+                TenantPlugin.plugin_id == plugin_id
+            ).values(config=config, updated_at=db.func.current_timestamp())
+            .returning(TenantPlugin.id),
+            execution_options={'synchronize_session': False}
+        )
+        if result.first() is None:
+            return False
+        
+        try:
+            db.session.commit()
+            logger.info(f"Updated config of plugin (ID: {plugin_id}) for tenant (ID: {tenant_id})")
+            return True
             
-            try:
-                db.session.commit()
-                logger.info(f"Disabled plugin (ID: {plugin_id}) for tenant (ID: {tenant_id})")
-                return True
-                
-            except Exception as e:
-                db.session.rollback()
-                logger.error(f"Error disabling plugin: {str(e)}")
-                raise
-        
-        return False
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error updating plugin configuration: {str(e)}")
+            raise
+    
+    @staticmethod
+    def assign_tenants(plugin_id, tenant_ids, selected_ids):
+        """Enable a plugin for the selected tenants and disable it for the rest
+        
+        Only tenants in tenant_ids are touched. Existing rows are read in one
+        query and all changes are written in a single commit.
+        """
+        selected_ids = set(selected_ids)
+        existing = dict(db.session.query(TenantPlugin.tenant_id, TenantPlugin.enabled).filter(
+            TenantPlugin.plugin_id == plugin_id,
+            TenantPlugin.tenant_id.in_(tenant_ids)
+        ).all())
+        
+        to_enable, to_insert, to_disable = [], [], []
+        for tenant_id in tenant_ids:
+            if tenant_id in selected_ids:
+                if tenant_id not in existing:
+                    to_insert.append(tenant_id)
+                elif not existing[tenant_id]:
+                    to_enable.append(tenant_id)
+            elif existing.get(tenant_id):
+                to_disable.append(tenant_id)
+        
+        try:
+            for ids, enabled in ((to_enable, True), (to_disable, False)):
+                if ids:
+                    db.session.execute(
+                        update(TenantPlugin).where(
+                            TenantPlugin.plugin_id == plugin_id,
+                            TenantPlugin.tenant_id.in_(ids)
+                        ).values(enabled=enabled, updated_at=db.func.current_timestamp()),
+                        execution_options={'synchronize_session': False}
+                    )
+            
+            if to_insert:
+                # A concurrent request may have created the row in the meantime
+                stmt = pg_insert(TenantPlugin).values([
+                    {'tenant_id': tenant_id, 'plugin_id': plugin_id, 'enabled': True, 'config': {}}
+                    for tenant_id in to_insert
+                ])
+                db.session.execute(stmt.on_conflict_do_update(
+                    index_elements=['tenant_id', 'plugin_id'],
+                    set_={'enabled': True, 'updated_at': db.func.current_timestamp()}
+                ))
+            
+            db.session.commit()
+            logger.info(f"Assigned plugin (ID: {plugin_id}): enabled {len(to_enable) + len(to_insert)}, "
+                        f"disabled {len(to_disable)} tenants")
+            
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error assigning plugin to tenants: {str(e)}")
+            raise
     
     @staticmethod
     def get_tenant_plugins(tenant_id, include_disabled=False):
@@ -93,4 +193,22 @@ class TenantPlugin(BaseModel):
         if not include_disabled:
             query = query.filter_by(enabled=True)
         
-        return query.all()
\ No newline at end of file
+        return query.all()
+    
+    @staticmethod
+    def get_with_plugin(tenant_id, slug, *options):
+        """Get a plugin by slug and its association with a tenant in one query
+        
+        Returns (plugin, tenant_plugin); either may be None.
+        """
+        from app.plugins.plugin import Plugin
+        
+        row = db.session.execute(
+            select(Plugin, TenantPlugin)
+            .options(*options)
+            .outerjoin(TenantPlugin, and_(TenantPlugin.plugin_id == Plugin.id,
+                                          TenantPlugin.tenant_id == tenant_id))
+            .where(Plugin.slug == slug)
+        ).first()
+        
+        return (row[0], row[1]) if row else (None, None)
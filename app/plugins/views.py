@@ -5,14 +5,57 @@ from app.plugins.tenant_plugin import TenantPlugin
 from app.plugins.plugin_manager import PluginManager
 from app.auth.rbac import permission_required, system_admin_required
 from app.tenant.middleware import tenant_required, get_current_tenant
+from sqlalchemy import and_
+from sqlalchemy.orm import load_only
 import logging
 import json
 from flask_login import current_user
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 logger = logging.getLogger(__name__)
 
+def _loads(data):
+    """Decode JSON with orjson when installed; both raise json.JSONDecodeError"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 # Create blueprint
 plugin_bp = Blueprint('plugins', __name__, url_prefix='/plugins')
 
+# (plugin id, updated_at) -> config schema as shown on the configure page
+_schema_json_cache = {}
+
+def _config_schema_json(plugin):
+    """Pretty-print a plugin's config schema, re-encoding only when the plugin row changes"""
+    key = (plugin.id, plugin.updated_at)
+    schema_json = _schema_json_cache.get(key)
+    if schema_json is None:
+        schema_json = json.dumps(plugin.config_schema, indent=4, sort_keys=True)
+        
+        # Drop encodings of older versions of this plugin
+        for old_key in [k for k in _schema_json_cache if k[0] == plugin.id]:
+            _schema_json_cache.pop(old_key, None)
+        _schema_json_cache[key] = schema_json
+    return schema_json
+
+# (catalog etag, summary rows) of the last plugin listing
+_catalog_rows_cache = (None, None)
+
+def _catalog_rows():
+    """All plugins as summary rows, re-read only when the catalog fingerprint changes"""
+    global _catalog_rows_cache
+    
+    etag = Plugin.catalog_etag()
+    cached_etag, rows = _catalog_rows_cache
+    if cached_etag != etag:
+        rows = Plugin.summary_query().all()
+        _catalog_rows_cache = (etag, rows)
+    return rows
+
 @plugin_bp.route('/')
 @permission_required('view_plugins')
 def index():
@@ -21,7 +64,7 @@ def index():
     tenant = get_current_tenant()
     
     # Get all plugins
-    plugins = Plugin.query.all()
+    plugins = _catalog_rows()
     
     # Get tenant plugins (if tenant context exists)
     tenant_plugins = []
@@ -41,7 +84,7 @@ def index():
 def admin():
     """Plugin administration for system admins"""
     # Get all plugins
-    plugins = Plugin.query.all()
+    plugins = _catalog_rows()
     
     return render_template('plugins/admin.html',
                           title='Plugin Administration',
@@ -56,7 +99,7 @@ def discover():
     
     try:
         # Discover plugins
-        discovered = plugin_manager.discover_plugins()
+        discovered = plugin_manager.discover_plugins(force=request.values.get('force') == '1')
         
         if discovered:
             flash(f"Discovered {len(discovered)} plugins", 'success')
@@ -73,22 +116,23 @@ def discover():
 @permission_required('view_plugins')
 def view(slug):
     """View plugin details"""
-    # Get the plugin
-    plugin = Plugin.query.filter_by(slug=slug).first()
-    if not plugin:
-        flash(f"Plugin '{slug}' not found", 'warning')
-        return redirect(url_for('plugins.index'))
-    
     # Get current tenant
     tenant = get_current_tenant()
     
-    # Get tenant plugin configuration (if tenant context exists)
-    tenant_plugin = None
+    # Get the plugin, plus its tenant configuration in the same query if a
+    # tenant context exists; the details page never shows the config schema
+    columns = load_only(
+        Plugin.id, Plugin.name, Plugin.slug, Plugin.version, Plugin.description,
+        Plugin.author, Plugin.homepage, Plugin.entry_point, Plugin.status,
+        Plugin.is_system, Plugin.enabled_for_all
+    )
     if tenant:
-        tenant_plugin = TenantPlugin.query.filter_by(
-            tenant_id=tenant.id,
-            plugin_id=plugin.id
-        ).first()
+        plugin, tenant_plugin = TenantPlugin.get_with_plugin(tenant.id, slug, columns)
+    else:
+        plugin, tenant_plugin = Plugin.query.options(columns).filter_by(slug=slug).first(), None
+    if not plugin:
+        flash(f"Plugin '{slug}' not found", 'warning')
+        return redirect(url_for('plugins.index'))
     
     # Get all tenants and enabled tenant ids for system admins
     tenants = []
@@ -96,11 +140,10 @@ def view(slug):
     if current_user.is_system_admin:
         from app.tenant.tenant import Tenant
         tenants = Tenant.query.filter_by(status='active').all()
-        tenant_plugins = TenantPlugin.query.filter_by(
+        enabled_tenant_ids = [tenant_id for tenant_id, in db.session.query(TenantPlugin.tenant_id).filter_by(
             plugin_id=plugin.id,
             enabled=True
-        ).all()
-        enabled_tenant_ids = [tp.tenant_id for tp in tenant_plugins]
+        )]
     
     # Debug information
     plugin_debug = {
@@ -129,7 +172,7 @@ def view(slug):
 def assign_tenants(slug):
     """Assign plugin to multiple tenants"""
     # Get the plugin
-    plugin = Plugin.query.filter_by(slug=slug).first()
+    plugin = Plugin.get_plugin_by_slug(slug)
     if not plugin:
         flash(f"Plugin '{slug}' not found", 'warning')
         return redirect(url_for('plugins.index'))
@@ -145,7 +188,7 @@ def assign_tenants(slug):
     
     if request.method == 'POST':
         # Get form data
-        tenant_ids = request.form.getlist('tenant_ids')
+        tenant_ids = set(request.form.getlist('tenant_ids'))
         enabled_for_all = request.form.get('enabled_for_all') == 'on'
         
         try:
@@ -154,22 +197,14 @@ def assign_tenants(slug):
             db.session.commit()
             
             if not enabled_for_all:
-                # Process tenant selections
-                for tenant in tenants:
-                    # Check if tenant is selected
-                    if str(tenant.id) in tenant_ids:
-                        # Enable plugin for this tenant
-                        TenantPlugin.enable_for_tenant(tenant.id, plugin.id)
-                    else:
-                        # Disable plugin for this tenant
-                        tenant_plugin = TenantPlugin.query.filter_by(
-                            tenant_id=tenant.id,
-                            plugin_id=plugin.id
-                        ).first()
-                        
-                        if tenant_plugin and tenant_plugin.enabled:
-                            TenantPlugin.disable_for_tenant(tenant.id, plugin.id)
+                # Enable for selected tenants and disable for the rest in one go
+                TenantPlugin.assign_tenants(
+                    plugin.id,
+                    [tenant.id for tenant in tenants],
+                    [tenant.id for tenant in tenants if str(tenant.id) in tenant_ids]
+                )
             
+            PluginManager().invalidate_tenant_config(plugin_id=plugin.id)
             flash(f"Plugin '{plugin.name}' tenant assignments updated", 'success')
         except Exception as e:
             logger.error(f"Error assigning plugin to tenants: {str(e)}")
@@ -178,12 +213,10 @@ def assign_tenants(slug):
         return redirect(url_for('plugins.view', slug=slug))
     
     # Get currently enabled tenants for this plugin
-    enabled_tenant_ids = []
-    tenant_plugins = TenantPlugin.query.filter_by(
+    enabled_tenant_ids = [str(tenant_id) for tenant_id, in db.session.query(TenantPlugin.tenant_id).filter_by(
         plugin_id=plugin.id,
         enabled=True
-    ).all()
-    enabled_tenant_ids = [str(tp.tenant_id) for tp in tenant_plugins]
+    )]
     
     return render_template('plugins/assign_tenants.html',
                           title=f"Assign Tenants - {plugin.name}",
@@ -248,7 +281,7 @@ def enable(slug):
         return redirect(url_for('plugins.index'))
     
     # Get the plugin
-    plugin = Plugin.query.filter_by(slug=slug).first()
+    plugin = Plugin.get_plugin_by_slug(slug)
     if not plugin:
         flash(f"Plugin '{slug}' not found", 'warning')
         return redirect(url_for('plugins.index'))
@@ -261,6 +294,7 @@ def enable(slug):
     try:
         # Enable the plugin for tenant
         TenantPlugin.enable_for_tenant(tenant.id, plugin.id)
+        PluginManager().invalidate_tenant_config(tenant.id, plugin.id)
         
         flash(f"Plugin '{plugin.name}' enabled for tenant '{tenant.name}'", 'success')
             
@@ -283,7 +317,7 @@ def disable(slug):
         return redirect(url_for('plugins.index'))
     
     # Get the plugin
-    plugin = Plugin.query.filter_by(slug=slug).first()
+    plugin = Plugin.get_plugin_by_slug(slug)
     if not plugin:
         flash(f"Plugin '{slug}' not found", 'warning')
         return redirect(url_for('plugins.index'))
@@ -291,6 +325,7 @@ def disable(slug):
     try:
         # Disable the plugin for tenant
         success = TenantPlugin.disable_for_tenant(tenant.id, plugin.id)
+        PluginManager().invalidate_tenant_config(tenant.id, plugin.id)
         
         if success:
             flash(f"Plugin '{plugin.name}' disabled for tenant '{tenant.name}'", 'success')
@@ -315,18 +350,12 @@ def configure(slug):
         flash("No tenant context found", 'warning')
         return redirect(url_for('plugins.index'))
     
-    # Get the plugin
-    plugin = Plugin.query.filter_by(slug=slug).first()
+    # Get the plugin and its tenant configuration together
+    plugin, tenant_plugin = TenantPlugin.get_with_plugin(tenant.id, slug)
     if not plugin:
         flash(f"Plugin '{slug}' not found", 'warning')
         return redirect(url_for('plugins.index'))
     
-    # Get tenant plugin configuration
-    tenant_plugin = TenantPlugin.query.filter_by(
-        tenant_id=tenant.id,
-        plugin_id=plugin.id
-    ).first()
-    
     if not tenant_plugin or not tenant_plugin.enabled:
         flash(f"Plugin '{plugin.name}' is not enabled for tenant '{tenant.name}'", 'warning')
         return redirect(url_for('plugins.view', slug=slug))
@@ -335,17 +364,20 @@ def configure(slug):
         try:
             # Get configuration from form
             config_json = request.form.get('config', '{}')
-            config = json.loads(config_json)
+            config = _loads(config_json)
+            plugin.validate_config(config)
             
-            # Update configuration
-            tenant_plugin.config = config
-            db.session.commit()
+            # Update configuration in place
+            TenantPlugin.update_config(tenant.id, plugin.id, config)
+            PluginManager().invalidate_tenant_config(tenant.id, plugin.id)
             
             flash(f"Configuration for plugin '{plugin.name}' updated successfully", 'success')
             return redirect(url_for('plugins.view', slug=slug))
             
         except json.JSONDecodeError:
             flash("Invalid JSON configuration", 'danger')
+        except ValueError as e:
+            flash(f"Invalid configuration: {str(e)}", 'danger')
         except Exception as e:
             logger.error(f"Error updating plugin configuration: {str(e)}")
             flash(f"Error updating plugin configuration: {str(e)}", 'danger')
@@ -356,26 +388,33 @@ def configure(slug):
                           plugin=plugin,
                           tenant=tenant,
                           tenant_plugin=tenant_plugin,
-                          config_schema=plugin.config_schema)
+                          config_schema=plugin.config_schema,
+                          config_schema_json=_config_schema_json(plugin) if plugin.config_schema else None)
 
 @plugin_bp.route('/marketplace')
 @permission_required('view_plugins')
 def marketplace():
     """Plugin marketplace"""
-    # Get all active plugins
-    plugins = Plugin.query.filter_by(status=PluginStatus.ACTIVE.value).all()
-    
     # Get current tenant
     tenant = get_current_tenant()
     
-    # Create a map of enabled plugins for the tenant
+    # Get all active plugins
+    query = Plugin.summary_query().filter(Plugin.status == PluginStatus.ACTIVE.value)
+    
+    # Create a map of enabled plugins for the tenant, from the same query
     tenant_plugin_map = {}
     if tenant:
-        tenant_plugins = TenantPlugin.query.filter_by(
-            tenant_id=tenant.id,
-            enabled=True
+        plugins = query.add_columns(TenantPlugin.enabled).outerjoin(
+            TenantPlugin,
+            and_(
+                TenantPlugin.plugin_id == Plugin.id,
+                TenantPlugin.tenant_id == tenant.id,
+                TenantPlugin.enabled == True
+            )
         ).all()
-        tenant_plugin_map = {tp.plugin_id: True for tp in tenant_plugins}
+        tenant_plugin_map = {plugin.id: True for plugin in plugins if plugin.enabled}
+    else:
+        plugins = query.all()
     
     return render_template('plugins/marketplace.html',
                           title='Plugin Marketplace',
@@ -403,7 +442,7 @@ def logs():
 @system_admin_required
 def toggle_system(slug):
     """Toggle system plugin status"""
-    plugin = Plugin.query.filter_by(slug=slug).first()
+    plugin = Plugin.get_plugin_by_slug(slug)
     if not plugin:
         flash(f"Plugin '{slug}' not found", 'warning')
         return redirect(url_for('plugins.admin'))
@@ -426,7 +465,7 @@ def toggle_system(slug):
 @system_admin_required
 def toggle_enabled_for_all(slug):
     """Toggle enabled for all tenants status"""
-    plugin = Plugin.query.filter_by(slug=slug).first()
+    plugin = Plugin.get_plugin_by_slug(slug)
     if not plugin:
         flash(f"Plugin '{slug}' not found", 'warning')
         return redirect(url_for('plugins.admin'))
@@ -435,6 +474,7 @@ def toggle_enabled_for_all(slug):
         # Toggle enabled_for_all flag
         plugin.enabled_for_all = not plugin.enabled_for_all
         db.session.commit()
+        PluginManager().invalidate_tenant_config(plugin_id=plugin.id)
         
         flash(f"Plugin '{plugin.name}' is now {'enabled for all tenants' if plugin.enabled_for_all else 'not enabled for all tenants'}", 'success')
         return redirect(url_for('plugins.admin'))
@@ -1,13 +1,94 @@
 from flask import request, g, current_app
 from werkzeug.local import LocalProxy
 from functools import wraps
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
+from app import db
+from app.core.cache import LRUCache
 from app.tenant.tenant import Tenant
 import logging
+import re
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# Seconds a subdomain/domain/slug -> tenant resolution is reused
+TENANT_CACHE_TTL = 30
+
+# Maximum number of resolutions kept; keys come from the client (Host header,
+# ?tenant=), so the cache must not grow with them
+TENANT_CACHE_SIZE = 4096
+
+# (kind, value) -> (expires_at, detached Tenant or None)
+_tenant_cache = LRUCache(TENANT_CACHE_SIZE)
+_tenant_cache_lock = threading.Lock()
+
+# Leading label of a host with at least three labels (sub.example.com)
+_HOST_RE = re.compile(r'^([^.]+)\.[^.]+\.[^.]+')
+# Paths that never belong to a tenant
+_SKIP_PREFIXES = ('/static/',)
+_HEALTH_PATH = '/health'
+
+def _detached_copy(tenant):
+    """Detached Tenant with the same loaded column values, leaving the original in its session"""
+    values = {attr.key: getattr(tenant, attr.key) for attr in sa_inspect(Tenant).column_attrs}
+    copy = Tenant(**values)
+    make_transient_to_detached(copy)
+    return copy
+
+def _cached_tenant(key, loader, ttl=TENANT_CACHE_TTL, cache_misses=True):
+    """Resolve a tenant through a process-local TTL cache, remembering misses if asked"""
+    now = time.monotonic()
+    with _tenant_cache_lock:
+        cached = _tenant_cache[key] if key in _tenant_cache else None
+    if cached and cached[0] > now:
+        tenant = cached[1]
+        if tenant is None:
+            return None
+        # Reuse the request's own instance if it already holds this tenant
+        existing = db.session.identity_map.get(identity_key(Tenant, tenant.id))
+        if existing is not None:
+            return existing
+        # Hand the request its own session-bound copy without another SELECT
+        return db.session.merge(tenant, load=False)
+    
+    tenant = loader()
+    if tenant is not None or cache_misses:
+        # Cache a detached copy; the loaded instance may be one the request
+        # is already using, so it stays in the session untouched
+        cached_value = _detached_copy(tenant) if tenant is not None else None
+        with _tenant_cache_lock:
+            _tenant_cache[key] = (now + ttl, cached_value)
+    else:
+        with _tenant_cache_lock:
+            _tenant_cache.pop(key, None)
+    return tenant
+
+def get_tenant_by_slug_cached(slug, cache_misses=False):
+    """Get tenant by slug through the resolution cache; may be up to TENANT_CACHE_TTL old
+    
+    Unknown slugs are only remembered when cache_misses is set; slugs come from
+    the client, and a remembered miss outlives tenant creation in other workers.
+    """
+    return _cached_tenant(('slug', slug), lambda: Tenant.get_tenant_by_slug(slug), cache_misses=cache_misses)
+
+def invalidate_tenant_cache(slug=None, domain=None):
+    """Forget cached tenant resolutions for a slug and/or domain, or all of them"""
+    with _tenant_cache_lock:
+        if slug is None and domain is None:
+            _tenant_cache.clear()
+            return
+        for key in list(_tenant_cache):
+            kind, value = key
+            if kind == 'slug' and value == slug:
+                _tenant_cache.pop(key, None)
+            elif kind == 'host' and (value == domain or value.split('.')[0] == slug):
+                _tenant_cache.pop(key, None)
+
 def get_current_tenant():
-    """Get the current tenant from Flask g object"""
+    """Get the current tenant from Flask g object, identifying it on first use"""
     if 'tenant' not in g:
         g.tenant = identify_tenant()
     return g.tenant
@@ -20,33 +101,28 @@ def identify_tenant():
     Identify the current tenant based on request information.
     Returns None if no tenant is identified.
     """
-    # Check for tenant slug in subdomain (e.g., tenant-slug.example.com)
-    host = request.host.split(':')[0]  # Remove port if present
-    parts = host.split('.')
-    
     # Skip identification for certain paths (like static files)
-    if request.path.startswith('/static/'):
+    if request.path.startswith(_SKIP_PREFIXES) or request.path.rstrip('/') == _HEALTH_PATH:
         return None
     
-    # Check if we have a subdomain and it's not 'www'
-    if len(parts) > 2 and parts[0] != 'www':
-        # Try to get tenant by subdomain
-        tenant = Tenant.get_tenant_by_slug(parts[0])
-        if tenant:
-            logger.debug(f"Tenant identified by subdomain: {tenant.name}")
-            return tenant
+    # Check for tenant slug in subdomain (e.g., tenant-slug.example.com)
+    host = request.host.partition(':')[0]  # Remove port if present
     
-    # Check for custom domain mapping
-    tenant = Tenant.get_tenant_by_domain(host)
+    # Check the subdomain (if any, and not 'www') and custom domain mapping
+    # in a single query; a subdomain match wins over a domain match
+    match = _HOST_RE.match(host)
+    subdomain = match.group(1) if match and match.group(1) != 'www' else None
+    tenant = _cached_tenant(('host', host), lambda: Tenant.get_tenant_by_slug_or_domain(subdomain, host))
     if tenant:
-        logger.debug(f"Tenant identified by domain: {tenant.name}")
+        logger.debug(f"Tenant identified by host: {tenant.name}")
         return tenant
     
-    # Check for tenant slug in URL path (e.g., /tenant/{slug}/)
-    path_parts = request.path.split('/')
-    if len(path_parts) > 2 and path_parts[1] == 'tenant':
-        tenant_slug = path_parts[2]
-        tenant = Tenant.get_tenant_by_slug(tenant_slug)
+    # Check for tenant slug in URL path (e.g., /tenant/{slug}/); URL routing
+    # has already parsed it, and non-slug pages like /tenant/create are skipped
+    view_args = request.view_args or {}
+    if request.blueprint == 'tenant' and 'slug' in view_args:
+        tenant_slug = view_args['slug']
+        tenant = get_tenant_by_slug_cached(tenant_slug, cache_misses=False)
         if tenant:
             logger.debug(f"Tenant identified by URL path: {tenant.name}")
             return tenant
@@ -54,7 +130,8 @@ def identify_tenant():
     # Check for tenant in query string (e.g., ?tenant=slug)
     tenant_slug = request.args.get('tenant')
     if tenant_slug:
-        tenant = Tenant.get_tenant_by_slug(tenant_slug)
+        # Unknown ?tenant= values are not remembered, so arbitrary ones cannot fill the cache
+        tenant = get_tenant_by_slug_cached(tenant_slug, cache_misses=False)
         if tenant:
             logger.debug(f"Tenant identified by query parameter: {tenant.name}")
             return tenant
@@ -73,19 +150,18 @@ def tenant_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def set_tenant_schema_for_connection(connection, tenant):
-    """Set the search path for the connection to the tenant's schema"""
-    if tenant:
-        connection.execute(f'SET search_path TO "{tenant.schema_name}", public')
-    else:
-        connection.execute('SET search_path TO public')
-
 def tenant_middleware(app):
     """Middleware to identify tenant and set up request context"""
     
     @app.before_request
     def identify_tenant_before_request():
         """Identify the tenant from the request and store in Flask g"""
+        # Static files never belong to a tenant; skip the host lookup entirely
+        endpoint = request.endpoint
+        if endpoint and (endpoint == 'static' or endpoint.endswith('.static')):
+            g.tenant = None
+            return
+        
         tenant = identify_tenant()
         g.tenant = tenant
         
@@ -1,5 +1,6 @@
 from app import db
-from app.core.db import BaseModel
+from app.core.db import BaseModel, rows_fingerprint
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from datetime import datetime
 import logging
 
@@ -17,7 +18,8 @@ class TenantUsage(BaseModel):
     # Relationship
     tenant = db.relationship('Tenant', backref=db.backref('usage_records', lazy='dynamic'))
     
-    # Composite unique constraint
+    # Composite unique constraint; its (tenant_id, resource_type) index also
+    # serves tenant_id-only lookups and is the increment_usage upsert target
     __table_args__ = (
         db.UniqueConstraint('tenant_id', 'resource_type', name='uq_tenant_resource'),
     )
@@ -36,23 +38,14 @@ class QuotaManager:
     
     @staticmethod
     def get_usage(tenant, resource_type):
-        """Get current resource usage for a tenant"""
-        usage = TenantUsage.query.filter_by(
+        """Get current resource usage for a tenant, 0 if nothing is recorded yet"""
+        # Read-only: rows are created by update_usage/increment_usage
+        usage_amount = db.session.query(TenantUsage.usage_amount).filter_by(
             tenant_id=tenant.id,
             resource_type=resource_type
-        ).first()
-        
-        if not usage:
-            # Create new usage record if none exists
-            usage = TenantUsage(
-                tenant_id=tenant.id,
-                resource_type=resource_type,
-                usage_amount=0
-            )
-            db.session.add(usage)
-            db.session.commit()
+        ).scalar()
         
-        return usage.usage_amount
+        return usage_amount or 0
     
     @staticmethod
     def update_usage(tenant, resource_type, amount):
@@ -80,53 +73,150 @@ class QuotaManager:
     @staticmethod
     def increment_usage(tenant, resource_type, increment=1):
         """Increment resource usage for a tenant"""
-        usage = TenantUsage.query.filter_by(
+        # Single atomic INSERT ... ON CONFLICT DO UPDATE, so concurrent
+        # increments neither race nor need a prior SELECT
+        table = TenantUsage.__table__
+        stmt = pg_insert(table).values(
             tenant_id=tenant.id,
-            resource_type=resource_type
-        ).first()
+            resource_type=resource_type,
+            usage_amount=increment
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint='uq_tenant_resource',
+            set_={
+                'usage_amount': table.c.usage_amount + increment,
+                'last_updated': datetime.utcnow(),
+                'updated_at': db.func.current_timestamp()
+            }
+        ).returning(table.c.usage_amount)
         
-        if not usage:
-            # Create new usage record if none exists
-            usage = TenantUsage(
-                tenant_id=tenant.id,
-                resource_type=resource_type,
-                usage_amount=increment
-            )
-            db.session.add(usage)
-        else:
-            # Increment existing record
-            usage.usage_amount += increment
+        try:
+            usage_amount = db.session.execute(stmt).scalar()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error incrementing {resource_type} usage for {tenant.name}: {str(e)}")
+            raise
         
-        db.session.commit()
         logger.info(f"Incremented {resource_type} usage for {tenant.name} by {increment}")
-        return usage.usage_amount
+        return usage_amount
     
     @staticmethod
-    def check_quota_available(tenant, resource_type, amount=1):
-        """Check if tenant has quota available for a specific resource"""
-        current_usage = QuotaManager.get_usage(tenant, resource_type)
+    def try_consume(tenant, resource_type, amount=1):
+        """Atomically add to a tenant's usage if the result stays within quota
         
-        if resource_type == ResourceType.USERS:
-            limit = tenant.max_users
-        elif resource_type == ResourceType.STORAGE:
-            limit = tenant.max_storage_mb
+        Returns the new usage, or None (recording nothing) if the quota would be exceeded.
+        Unlike check_quota_available followed by increment_usage, concurrent
+        requests cannot both pass the check.
+        """
+        limit = QuotaManager.get_limit(tenant, resource_type)
+        if limit is None:
+            return QuotaManager.increment_usage(tenant, resource_type, amount)
+        if amount > limit:
+            # A first-time INSERT is not guarded by the ON CONFLICT condition
+            return None
+        
+        table = TenantUsage.__table__
+        new_amount = db.func.coalesce(table.c.usage_amount, 0) + amount
+        stmt = pg_insert(table).values(
+            tenant_id=tenant.id,
+            resource_type=resource_type,
+            usage_amount=amount
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint='uq_tenant_resource',
+            set_={
+                'usage_amount': new_amount,
+                'last_updated': datetime.utcnow(),
+                'updated_at': db.func.current_timestamp()
+            },
+            where=new_amount <= limit
+        ).returning(table.c.usage_amount)
+        
+        try:
+            usage_amount = db.session.execute(stmt).scalar()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error consuming {resource_type} quota for {tenant.name}: {str(e)}")
+            raise
+        
+        if usage_amount is None:
+            logger.info(f"{resource_type} quota exceeded for {tenant.name}")
         else:
+            logger.info(f"Consumed {amount} {resource_type} for {tenant.name}")
+        return usage_amount
+    
+    @staticmethod
+    def get_limit(tenant, resource_type):
+        """Get a tenant's quota for a resource, None if the resource is not limited"""
+        if resource_type == ResourceType.USERS:
+            return tenant.max_users
+        if resource_type == ResourceType.STORAGE:
+            return tenant.max_storage_mb
+        return None
+    
+    @staticmethod
+    def check_quota_available(tenant, resource_type, amount=1):
+        """Check if tenant has quota available for a specific resource"""
+        limit = QuotaManager.get_limit(tenant, resource_type)
+        if limit is None:
             # No limit defined for this resource type
             return True
         
         # Check if quota is exceeded
+        current_usage = QuotaManager.get_usage(tenant, resource_type)
         return (current_usage + amount) <= limit
     
     @staticmethod
-    def get_usage_percentage(tenant, resource_type):
-        """Get percentage of quota used for a specific resource"""
-        current_usage = QuotaManager.get_usage(tenant, resource_type)
+    def usage_etag(tenant):
+        """Fingerprint of a tenant row and its usage rows, cheaper than reading the usage"""
+        usage_fingerprint = rows_fingerprint(TenantUsage, TenantUsage.tenant_id == tenant.id)
         
-        if resource_type == ResourceType.USERS:
-            limit = tenant.max_users
-        elif resource_type == ResourceType.STORAGE:
-            limit = tenant.max_storage_mb
-        else:
+        tenant_updated = tenant.updated_at.timestamp() if tenant.updated_at else 0
+        return f"{tenant.id}-{tenant_updated}-{tenant.status}-{usage_fingerprint}"
+    
+    @staticmethod
+    def get_usage_bulk(tenant, resource_types):
+        """Map resource type to usage for one tenant in a single query"""
+        usage_map = QuotaManager.get_usage_for_tenants([tenant.id], resource_types)
+        return {resource_type: usage_map[(tenant.id, resource_type)] for resource_type in resource_types}
+    
+    @staticmethod
+    def get_usage_for_tenants(tenant_ids, resource_types):
+        """Map (tenant_id, resource_type) to usage for many tenants in one query
+        
+        Missing rows are reported as 0 usage.
+        """
+        usage_map = {
+            (tenant_id, resource_type): 0
+            for tenant_id in tenant_ids
+            for resource_type in resource_types
+        }
+        if not usage_map:
+            return usage_map
+        
+        rows = db.session.query(
+            TenantUsage.tenant_id, TenantUsage.resource_type, TenantUsage.usage_amount
+        ).filter(
+            TenantUsage.tenant_id.in_(tenant_ids),
+            TenantUsage.resource_type.in_(resource_types)
+        )
+        for tenant_id, resource_type, usage_amount in rows:
+            usage_map[(tenant_id, resource_type)] = usage_amount or 0
+        return usage_map
+    
+    @staticmethod
+    def get_usage_percentage(tenant, resource_type, current_usage=None):
+        """Get percentage of quota used for a specific resource
+        
+        Pass current_usage when it is already known to skip the usage lookup.
+        """
+        if current_usage is None:
+            current_usage = QuotaManager.get_usage(tenant, resource_type)
+        
+        limit = QuotaManager.get_limit(tenant, resource_type)
+        if limit is None:
             # No limit defined for this resource type
             return 0
         
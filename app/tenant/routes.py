@@ -1,8 +1,9 @@
-from flask import Blueprint, request, jsonify, g, current_app
+from flask import Blueprint, Response, request, jsonify, g, current_app
 from app import db
 from app.tenant.tenant import Tenant, TenantStatus
-from app.tenant.quota import QuotaManager, ResourceType
+from app.tenant.quota import QuotaManager
 from app.tenant.middleware import tenant_required, get_current_tenant
+from app.core.json_response import ojsonify
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,28 +11,34 @@ logger = logging.getLogger(__name__)
 # Create blueprint
 tenant_api = Blueprint('tenant_api', __name__, url_prefix='/api/tenant')
 
+def _conditional_response(etag, build):
+    """Answer 304 if the client already has etag, otherwise build the response and tag it"""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = build()
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 @tenant_api.route('/', methods=['GET'])
 def list_tenants():
     """List all tenants (admin only)"""
     # TODO: Add authorization check for admin
     
-    tenants = Tenant.query.all()
-    result = []
-    
-    for tenant in tenants:
-        result.append({
-            'id': tenant.id,
-            'name': tenant.name,
-            'slug': tenant.slug,
-            'domain': tenant.domain,
-            'status': tenant.status,
-            'plan': tenant.plan
+    def build():
+        # Plain rows of the listed columns; no Tenant objects are built
+        rows = db.session.query(
+            Tenant.id, Tenant.name, Tenant.slug, Tenant.domain, Tenant.status, Tenant.plan
+        ).all()
+        
+        return ojsonify({
+            'status': 'success',
+            'data': [dict(row._mapping) for row in rows]
         })
     
-    return jsonify({
-        'status': 'success',
-        'data': result
-    })
+    return _conditional_response(Tenant.list_etag(), build)
 
 @tenant_api.route('/', methods=['POST'])
 def create_tenant():
@@ -109,33 +116,13 @@ def get_tenant(slug):
             'message': f"Tenant '{slug}' not found"
         }), 404
     
-    # Get usage data
-    user_usage = QuotaManager.get_usage(tenant, ResourceType.USERS)
-    storage_usage = QuotaManager.get_usage(tenant, ResourceType.STORAGE)
-    
-    # Return tenant data
-    return jsonify({
+    # Usage is only read when the client's copy is out of date
+    return _conditional_response(QuotaManager.usage_etag(tenant), lambda: jsonify({
         'status': 'success',
-        'data': {
-            'id': tenant.id,
-            'name': tenant.name,
-            'slug': tenant.slug,
-            'domain': tenant.domain,
-            'description': tenant.description,
-            'status': tenant.status,
-            'plan': tenant.plan,
-            'quotas': {
-                'max_users': tenant.max_users,
-                'max_storage_mb': tenant.max_storage_mb
-            },
-            'usage': {
-                'users': user_usage,
-                'storage_mb': storage_usage,
-                'users_percentage': QuotaManager.get_usage_percentage(tenant, ResourceType.USERS),
-                'storage_percentage': QuotaManager.get_usage_percentage(tenant, ResourceType.STORAGE)
-            }
-        }
-    })
+        'data': tenant.to_view_dict(fields=(
+            'id', 'name', 'slug', 'domain', 'description', 'status', 'plan'
+        ))
+    }))
 
 @tenant_api.route('/<slug>', methods=['PUT', 'PATCH'])
 def update_tenant(slug):
@@ -180,6 +167,9 @@ def update_tenant(slug):
     try:
         db.session.commit()
         
+        # The domain may have changed, so drop every cached resolution
+        Tenant.invalidate_cache()
+        
         return jsonify({
             'status': 'success',
             'message': f"Tenant '{tenant.name}' updated successfully",
@@ -224,22 +214,15 @@ def update_tenant_status(slug):
     new_status = data['status']
     
     # Validate status
-    valid_statuses = [
-        TenantStatus.ACTIVE,
-        TenantStatus.INACTIVE,
-        TenantStatus.SUSPENDED
-    ]
-    
-    if new_status not in valid_statuses:
+    if new_status not in TenantStatus.MUTABLE:
         return jsonify({
             'status': 'error',
-            'message': f"Invalid status: {new_status}. Valid values are: {', '.join(valid_statuses)}"
+            'message': f"Invalid status: {new_status}. Valid values are: {', '.join(sorted(TenantStatus.MUTABLE))}"
         }), 400
     
     try:
         # Update status
-        tenant.status = new_status
-        db.session.commit()
+        tenant.set_status(new_status)
         
         return jsonify({
             'status': 'success',
@@ -299,28 +282,7 @@ def get_current_tenant_info():
             'message': "No tenant context found"
         }), 404
     
-    # Get usage data
-    user_usage = QuotaManager.get_usage(tenant, ResourceType.USERS)
-    storage_usage = QuotaManager.get_usage(tenant, ResourceType.STORAGE)
-    
-    return jsonify({
+    return _conditional_response(QuotaManager.usage_etag(tenant), lambda: jsonify({
         'status': 'success',
-        'data': {
-            'id': tenant.id,
-            'name': tenant.name,
-            'slug': tenant.slug,
-            'domain': tenant.domain,
-            'status': tenant.status,
-            'plan': tenant.plan,
-            'quotas': {
-                'max_users': tenant.max_users,
-                'max_storage_mb': tenant.max_storage_mb
-            },
-            'usage': {
-                'users': user_usage,
-                'storage_mb': storage_usage,
-                'users_percentage': QuotaManager.get_usage_percentage(tenant, ResourceType.USERS),
-                'storage_percentage': QuotaManager.get_usage_percentage(tenant, ResourceType.STORAGE)
-            }
-        }
-    })
\ No newline at end of file
+        'data': tenant.to_view_dict()
+    }))
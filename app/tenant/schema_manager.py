@@ -1,92 +1,99 @@
-from sqlalchemy import create_engine, text
-from flask import current_app
+from sqlalchemy import text
+from app import db
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+# Schema names Tenant.create_tenant generates
+_SCHEMA_NAME_RE = re.compile(r'^tenant_[0-9a-f]{16}$')
+
 class SchemaManager:
     """Manage PostgreSQL schemas for tenant isolation"""
     
     @staticmethod
-    def get_engine():
-        """Get SQLAlchemy engine with admin privileges"""
-        return create_engine(current_app.config['SQLALCHEMY_DATABASE_URI'])
+    def quote_schema(schema_name):
+        """Validate a tenant schema name and quote it for use in SQL, raising ValueError if invalid"""
+        if not isinstance(schema_name, str) or not _SCHEMA_NAME_RE.match(schema_name):
+            raise ValueError(f"Invalid tenant schema name: {schema_name!r}")
+        return db.engine.dialect.identifier_preparer.quote_identifier(schema_name)
+    
+    @staticmethod
+    def _autocommit_connection():
+        """Connection that commits each statement, so DDL releases its catalog locks right away"""
+        return db.engine.connect().execution_options(isolation_level='AUTOCOMMIT')
     
     @staticmethod
-    def create_schema(schema_name):
-        """Create a new PostgreSQL schema"""
-        engine = SchemaManager.get_engine()
+    def create_schema(schema_name, connection=None):
+        """Create a new PostgreSQL schema, inside the given connection's transaction if any"""
+        # Identifiers cannot be bound parameters, so DDL only ever sees validated names
+        statement = text(f'CREATE SCHEMA IF NOT EXISTS {SchemaManager.quote_schema(schema_name)}')
+        if connection is not None:
+            connection.execute(statement)
+            logger.info(f"Schema created: {schema_name}")
+            return
         
         try:
-            with engine.connect() as connection:
-                connection.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema_name}"'))
+            with SchemaManager._autocommit_connection() as connection:
+                connection.execute(statement)
                 logger.info(f"Schema created: {schema_name}")
         except Exception as e:
             logger.error(f"Error creating schema {schema_name}: {str(e)}")
             raise
-        finally:
-            engine.dispose()
     
     @staticmethod
     def drop_schema(schema_name):
         """Drop a PostgreSQL schema and all its objects"""
-        engine = SchemaManager.get_engine()
-        
+        statement = text(f'DROP SCHEMA IF EXISTS {SchemaManager.quote_schema(schema_name)} CASCADE')
         try:
-            with engine.connect() as connection:
-                connection.execute(text(f'DROP SCHEMA IF EXISTS "{schema_name}" CASCADE'))
+            with SchemaManager._autocommit_connection() as connection:
+                connection.execute(statement)
                 logger.info(f"Schema dropped: {schema_name}")
         except Exception as e:
             logger.error(f"Error dropping schema {schema_name}: {str(e)}")
             raise
-        finally:
-            engine.dispose()
     
     @staticmethod
     def schema_exists(schema_name):
         """Check if a schema exists"""
-        engine = SchemaManager.get_engine()
-        
+        # Names create_tenant could never have generated need no round trip
+        if not isinstance(schema_name, str) or not _SCHEMA_NAME_RE.match(schema_name):
+            return False
         try:
-            with engine.connect() as connection:
+            with db.engine.connect() as connection:
                 result = connection.execute(text(
-                    "SELECT schema_name FROM information_schema.schemata "
-                    f"WHERE schema_name = '{schema_name}'"
-                ))
+                    "SELECT 1 FROM pg_catalog.pg_namespace WHERE nspname = :name"
+                ).bindparams(name=schema_name))
                 return result.scalar() is not None
         except Exception as e:
             logger.error(f"Error checking schema {schema_name}: {str(e)}")
             raise
-        finally:
-            engine.dispose()
     
     @staticmethod
     def list_schemas():
         """List all tenant schemas"""
-        engine = SchemaManager.get_engine()
-        
         try:
-            with engine.connect() as connection:
+            with db.engine.connect() as connection:
                 result = connection.execute(text(
-                    "SELECT schema_name FROM information_schema.schemata "
-                    "WHERE schema_name LIKE 'tenant_%'"
+                    "SELECT nspname FROM pg_catalog.pg_namespace "
+                    "WHERE nspname LIKE 'tenant\\_%' ESCAPE '\\'"
                 ))
                 return [row[0] for row in result]
         except Exception as e:
             logger.error(f"Error listing schemas: {str(e)}")
             raise
-        finally:
-            engine.dispose()
     
     @staticmethod
     def create_tenant_tables(schema_name):
         """Create tables in the tenant schema"""
-        engine = SchemaManager.get_engine()
-        
+        # Validate before checking out a connection
+        search_path = SchemaManager.quote_schema(schema_name)
         try:
-            # Set search path to the tenant schema
-            with engine.connect() as connection:
-                connection.execute(text(f'SET search_path TO "{schema_name}"'))
+            with db.engine.begin() as connection:
+                # Set search path to the tenant schema for this transaction only,
+                # so the pooled connection goes back with its default path
+                connection.execute(text("SELECT set_config('search_path', :search_path, true)"),
+                                   {'search_path': search_path})
                 
                 # Create tenant-specific tables
                 # This is where you would create tables specific to each tenant
@@ -95,6 +102,4 @@ class SchemaManager:
                 logger.info(f"Created tables in schema: {schema_name}")
         except Exception as e:
             logger.error(f"Error creating tables in schema {schema_name}: {str(e)}")
-            raise
-        finally:
-            engine.dispose()
\ No newline at end of file
+            raise
\ No newline at end of file
@@ -1,12 +1,21 @@
 from app import db
-from app.core.db import BaseModel
+from app.core.db import BaseModel, rows_fingerprint
+from app.tenant.quota import QuotaManager, ResourceType
+from app.tenant.schema_manager import SchemaManager
 from datetime import datetime
+from sqlalchemy import or_, text, update
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm.attributes import set_committed_value
+import re
+import unicodedata
 import uuid
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Runs of characters that are not allowed in a slug
+_SLUG_INVALID_RE = re.compile(r'[^a-z0-9]+')
+
 class TenantStatus:
     """Enum for tenant status"""
     ACTIVE = 'active'
@@ -14,6 +23,9 @@ class TenantStatus:
     SUSPENDED = 'suspended'
     PROVISIONING = 'provisioning'
     DECOMMISSIONING = 'decommissioning'
+    
+    # Statuses an admin may set directly
+    MUTABLE = frozenset({ACTIVE, INACTIVE, SUSPENDED})
 
 class Tenant(BaseModel):
     """Tenant model for multi-tenant isolation"""
@@ -40,41 +52,74 @@ class Tenant(BaseModel):
     # Billing information
     plan = db.Column(db.String(50), default='free')
     
+    # Partial index for the status filters used by admin listings
+    __table_args__ = (
+        db.Index('ix_tenants_status', 'status',
+                 postgresql_where=db.text("status IN ('active', 'provisioning')")),
+    )
+    
     def __repr__(self):
         return f'<Tenant {self.name}>'
     
+    def to_view_dict(self, fields=('id', 'name', 'slug', 'domain', 'status', 'plan'), usage=None):
+        """Selected tenant fields plus quotas and usage, as shown by tenant pages and API responses
+        
+        usage maps resource type to amount (include API_CALLS to report it);
+        when omitted, user and storage usage are read in one query.
+        """
+        if usage is None:
+            usage = QuotaManager.get_usage_bulk(self, [ResourceType.USERS, ResourceType.STORAGE])
+        user_usage = usage[ResourceType.USERS]
+        storage_usage = usage[ResourceType.STORAGE]
+        
+        data = {field: getattr(self, field) for field in fields}
+        data['quotas'] = {
+            'max_users': self.max_users,
+            'max_storage_mb': self.max_storage_mb
+        }
+        data['usage'] = {
+            'users': user_usage,
+            'storage_mb': storage_usage,
+            'users_percentage': QuotaManager.get_usage_percentage(self, ResourceType.USERS, user_usage),
+            'storage_percentage': QuotaManager.get_usage_percentage(self, ResourceType.STORAGE, storage_usage)
+        }
+        if ResourceType.API_CALLS in usage:
+            data['usage']['api_calls'] = usage[ResourceType.API_CALLS]
+        return data
+    
     @staticmethod
     def create_tenant(name, owner_email, description=None, domain=None, plan='free'):
         """Create a new tenant"""
-        # Generate slug from name
-        slug = name.lower().replace(' ', '-')
-        
         # Generate schema name (must be valid PostgreSQL schema name)
         schema_name = f"tenant_{uuid.uuid4().hex[:16]}"
         
-        # Create tenant record
-        tenant = Tenant(
-            name=name,
-            slug=slug,
-            schema_name=schema_name,
-            description=description,
-            domain=domain,
-            owner_email=owner_email,
-            plan=plan
-        )
-        
         try:
+            # Generate slug from name, locking it until this transaction ends
+            slug = Tenant.generate_slug(name)
+            
+            # Create tenant record
+            tenant = Tenant(
+                name=name,
+                slug=slug,
+                schema_name=schema_name,
+                description=description,
+                domain=domain,
+                owner_email=owner_email,
+                plan=plan
+            )
             db.session.add(tenant)
-            db.session.commit()
             
-            # Create tenant schema (will be implemented in schema_manager.py)
-            from app.tenant.schema_manager import SchemaManager
-            SchemaManager.create_schema(tenant.schema_name)
+            # Create tenant schema in the same transaction (PostgreSQL DDL is
+            # transactional), so the row and its schema commit or fail together
+            SchemaManager.create_schema(tenant.schema_name, connection=db.session.connection())
             
             # Set tenant to active after schema creation
             tenant.status = TenantStatus.ACTIVE
             db.session.commit()
             
+            # A lookup may have cached this slug or domain as unknown
+            Tenant.invalidate_cache(tenant.slug, tenant.domain)
+            
             logger.info(f"Tenant created: {tenant.name} (schema: {tenant.schema_name})")
             return tenant
             
@@ -83,6 +128,43 @@ class Tenant(BaseModel):
             logger.error(f"Error creating tenant: {str(e)}")
             raise
     
+    @staticmethod
+    def generate_slug(name):
+        """URL-safe slug for a tenant name, suffixed with -2, -3, ... if it is already taken
+        
+        Holds a transaction-scoped advisory lock on the base slug, so concurrent
+        creations of similarly named tenants pick distinct slugs; the caller's
+        commit or rollback releases it.
+        """
+        ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+        base = _SLUG_INVALID_RE.sub('-', ascii_name.lower()).strip('-')[:90] or 'tenant'
+        
+        db.session.execute(text('SELECT pg_advisory_xact_lock(hashtext(:slug))'), {'slug': base})
+        
+        # Every taken variant of the slug in one query, instead of an INSERT
+        # that fails on the unique index
+        taken = {slug for slug, in db.session.query(Tenant.slug).filter(
+            or_(Tenant.slug == base, Tenant.slug.like(f'{base}-%'))
+        )}
+        if base not in taken:
+            return base
+        
+        suffix = 2
+        while f'{base}-{suffix}' in taken:
+            suffix += 1
+        return f'{base}-{suffix}'
+    
+    @staticmethod
+    def invalidate_cache(slug=None, domain=None):
+        """Forget cached request-to-tenant resolutions; everything if no key is given"""
+        from app.tenant.middleware import invalidate_tenant_cache
+        invalidate_tenant_cache(slug, domain)
+    
+    @staticmethod
+    def list_etag():
+        """Fingerprint of the tenants table that changes on any insert, update or delete"""
+        return rows_fingerprint(Tenant)
+    
     @staticmethod
     def get_tenant_by_slug(slug):
         """Get tenant by slug"""
@@ -93,26 +175,59 @@ class Tenant(BaseModel):
         """Get tenant by domain"""
         return Tenant.query.filter_by(domain=domain).first()
     
+    @staticmethod
+    def get_tenant_by_slug_or_domain(slug, domain):
+        """Get tenant by slug or domain in one query, preferring the slug match"""
+        if slug is None:
+            return Tenant.get_tenant_by_domain(domain)
+        
+        tenants = Tenant.query.filter(or_(Tenant.slug == slug, Tenant.domain == domain)).limit(2).all()
+        for tenant in tenants:
+            if tenant.slug == slug:
+                return tenant
+        return tenants[0] if tenants else None
+    
+    def set_status(self, new_status):
+        """Change the tenant's status with a single UPDATE; no-op if it already has it
+        
+        Returns True if the status changed.
+        """
+        if self.status == new_status:
+            return False
+        
+        # Read before the commit expires them
+        name, slug, domain = self.name, self.slug, self.domain
+        
+        try:
+            db.session.execute(
+                update(Tenant).where(Tenant.id == self.id)
+                .values(status=new_status, updated_at=db.func.current_timestamp()),
+                execution_options={'synchronize_session': False}
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error changing status of tenant {name}: {str(e)}")
+            raise
+        
+        # Keep the new value without reloading the row
+        set_committed_value(self, 'status', new_status)
+        Tenant.invalidate_cache(slug, domain)
+        logger.info(f"Tenant {name} status changed to {new_status}")
+        return True
+    
     def activate(self):
         """Activate a tenant"""
-        if self.status != TenantStatus.ACTIVE:
-            self.status = TenantStatus.ACTIVE
-            db.session.commit()
-            logger.info(f"Tenant activated: {self.name}")
+        self.set_status(TenantStatus.ACTIVE)
     
     def deactivate(self):
         """Deactivate a tenant"""
         if self.status == TenantStatus.ACTIVE:
-            self.status = TenantStatus.INACTIVE
-            db.session.commit()
-            logger.info(f"Tenant deactivated: {self.name}")
+            self.set_status(TenantStatus.INACTIVE)
     
     def suspend(self):
         """Suspend a tenant"""
-        if self.status != TenantStatus.SUSPENDED:
-            self.status = TenantStatus.SUSPENDED
-            db.session.commit()
-            logger.info(f"Tenant suspended: {self.name}")
+        self.set_status(TenantStatus.SUSPENDED)
     
     def delete(self):
         """Mark tenant for deletion and trigger schema removal"""
@@ -120,13 +235,14 @@ class Tenant(BaseModel):
         db.session.commit()
         
         try:
-            # Remove tenant schema (will be implemented in schema_manager.py)
-            from app.tenant.schema_manager import SchemaManager
+            # Remove tenant schema
             SchemaManager.drop_schema(self.schema_name)
             
             # Delete tenant record
+            slug, domain = self.slug, self.domain
             db.session.delete(self)
             db.session.commit()
+            Tenant.invalidate_cache(slug, domain)
             logger.info(f"Tenant deleted: {self.name}")
             
         except Exception as e:
@@ -143,10 +259,12 @@ class Tenant(BaseModel):
             self.max_storage_mb = max_storage_mb
         
         db.session.commit()
+        Tenant.invalidate_cache(self.slug, self.domain)
         logger.info(f"Tenant quota updated: {self.name}")
     
     def update_plan(self, plan):
         """Update tenant subscription plan"""
         self.plan = plan
         db.session.commit()
+        Tenant.invalidate_cache(self.slug, self.domain)
         logger.info(f"Tenant plan updated: {self.name} to {plan}")
\ No newline at end of file
@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from app import db
 from app.tenant.tenant import Tenant, TenantStatus
 from app.tenant.quota import QuotaManager, ResourceType
+from app.tenant.middleware import get_tenant_by_slug_cached
 import logging
 from datetime import datetime
 logger = logging.getLogger(__name__)
@@ -9,43 +10,42 @@ logger = logging.getLogger(__name__)
 # Create blueprint
 tenant_bp = Blueprint('tenant', __name__, url_prefix='/tenant')
 
+# Tenants shown per page of the management dashboard
+TENANTS_PER_PAGE = 50
+
 @tenant_bp.route('/')
 def index():
     """Tenant management dashboard"""
     # TODO: Add authorization check for admin
     
-    # Get all tenants
-    tenants = Tenant.query.all()
+    # Get one page of tenants
+    page = request.args.get('page', 1, type=int)
+    pagination = Tenant.query.order_by(Tenant.id).paginate(
+        page=page, per_page=TENANTS_PER_PAGE, error_out=False
+    )
+    tenants = pagination.items
     
-    # Get usage data for each tenant
-    tenant_data = []
-    for tenant in tenants:
-        user_usage = QuotaManager.get_usage(tenant, ResourceType.USERS)
-        storage_usage = QuotaManager.get_usage(tenant, ResourceType.STORAGE)
-        
-        tenant_data.append({
-            'id': tenant.id,
-            'name': tenant.name,
-            'slug': tenant.slug,
-            'domain': tenant.domain,
-            'status': tenant.status,
-            'plan': tenant.plan,
-            'owner_email': tenant.owner_email,
-            'quotas': {  # Add this explicitly
-                'max_users': tenant.max_users,
-                'max_storage_mb': tenant.max_storage_mb
-            },
-            'usage': {
-                'users': user_usage,
-                'storage_mb': storage_usage,
-                'users_percentage': QuotaManager.get_usage_percentage(tenant, ResourceType.USERS),
-                'storage_percentage': QuotaManager.get_usage_percentage(tenant, ResourceType.STORAGE)
+    # Get usage data for every tenant in one query
+    usage_map = QuotaManager.get_usage_for_tenants(
+        [tenant.id for tenant in tenants],
+        [ResourceType.USERS, ResourceType.STORAGE]
+    )
+    
+    tenant_data = [
+        tenant.to_view_dict(
+            fields=('id', 'name', 'slug', 'domain', 'status', 'plan', 'owner_email'),
+            usage={
+                ResourceType.USERS: usage_map[(tenant.id, ResourceType.USERS)],
+                ResourceType.STORAGE: usage_map[(tenant.id, ResourceType.STORAGE)]
             }
-        })
+        )
+        for tenant in tenants
+    ]
     
     return render_template('tenant/dashboard.html', 
                           title='Tenant Management', 
-                          tenants=tenant_data)
+                          tenants=tenant_data,
+                          pagination=pagination)
 
 @tenant_bp.route('/create', methods=['GET', 'POST'])
 def create():
@@ -96,38 +96,16 @@ def view(slug):
     """View tenant details"""
     # TODO: Add authorization check for admin or tenant owner
     
-    tenant = Tenant.get_tenant_by_slug(slug)
+    # Read-only page, so a recently cached tenant is good enough
+    tenant = get_tenant_by_slug_cached(slug, cache_misses=False)
     if not tenant:
         flash(f"Tenant '{slug}' not found", 'warning')
         return redirect(url_for('tenant.index'))
     
-    # Get usage data
-    user_usage = QuotaManager.get_usage(tenant, ResourceType.USERS)
-    storage_usage = QuotaManager.get_usage(tenant, ResourceType.STORAGE)
-    
-    tenant_data = {
-        'id': tenant.id,
-        'name': tenant.name,
-        'slug': tenant.slug,
-        'schema_name': tenant.schema_name,
-        'domain': tenant.domain,
-        'description': tenant.description,
-        'status': tenant.status,
-        'plan': tenant.plan,
-        'owner_email': tenant.owner_email,
-        'created_at': tenant.created_at,
-        'updated_at': tenant.updated_at,
-        'quotas': {
-            'max_users': tenant.max_users,
-            'max_storage_mb': tenant.max_storage_mb
-        },
-        'usage': {
-            'users': user_usage,
-            'storage_mb': storage_usage,
-            'users_percentage': QuotaManager.get_usage_percentage(tenant, ResourceType.USERS),
-            'storage_percentage': QuotaManager.get_usage_percentage(tenant, ResourceType.STORAGE)
-        }
-    }
+    tenant_data = tenant.to_view_dict(fields=(
+        'id', 'name', 'slug', 'schema_name', 'domain', 'description', 'status', 'plan',
+        'owner_email', 'created_at', 'updated_at'
+    ))
     
     return render_template('tenant/settings.html', 
                           title=f"Tenant: {tenant.name}", 
@@ -173,6 +151,9 @@ def edit(slug):
             
             db.session.commit()
             
+            # The domain may have changed, so drop every cached resolution
+            Tenant.invalidate_cache()
+            
             flash(f"Tenant '{tenant.name}' updated successfully", 'success')
             return redirect(url_for('tenant.view', slug=tenant.slug))
             
@@ -181,30 +162,10 @@ def edit(slug):
             logger.error(f"Error updating tenant: {str(e)}")
             flash(f"Failed to update tenant: {str(e)}", 'danger')
     
-    # Get usage data for display
-    user_usage = QuotaManager.get_usage(tenant, ResourceType.USERS)
-    storage_usage = QuotaManager.get_usage(tenant, ResourceType.STORAGE)
-    
-    tenant_data = {
-        'id': tenant.id,
-        'name': tenant.name,
-        'slug': tenant.slug,
-        'domain': tenant.domain,
-        'description': tenant.description,
-        'status': tenant.status,
-        'plan': tenant.plan,
-        'owner_email': tenant.owner_email,
-        'quotas': {
-            'max_users': tenant.max_users,
-            'max_storage_mb': tenant.max_storage_mb
-        },
-        'usage': {
-            'users': user_usage,
-            'storage_mb': storage_usage,
-            'users_percentage': QuotaManager.get_usage_percentage(tenant, ResourceType.USERS),
-            'storage_percentage': QuotaManager.get_usage_percentage(tenant, ResourceType.STORAGE)
-        }
-    }
+    # Tenant details and usage for display
+    tenant_data = tenant.to_view_dict(fields=(
+        'id', 'name', 'slug', 'domain', 'description', 'status', 'plan', 'owner_email'
+    ))
     
     return render_template('tenant/edit.html', 
                           title=f"Edit Tenant: {tenant.name}", 
@@ -225,27 +186,22 @@ def update_status(slug):
     new_status = request.form.get('status')
     
     # Validate status
-    valid_statuses = [
-        TenantStatus.ACTIVE,
-        TenantStatus.INACTIVE,
-        TenantStatus.SUSPENDED
-    ]
-    
-    if new_status not in valid_statuses:
+    if new_status not in TenantStatus.MUTABLE:
         flash(f"Invalid status: {new_status}", 'danger')
         return redirect(url_for('tenant.view', slug=slug))
     
+    # Status -> (transition, past tense for the message)
+    actions = {
+        TenantStatus.ACTIVE: (tenant.activate, 'activated'),
+        TenantStatus.INACTIVE: (tenant.deactivate, 'deactivated'),
+        TenantStatus.SUSPENDED: (tenant.suspend, 'suspended')
+    }
+    
     try:
         # Update status based on the action
-        if new_status == TenantStatus.ACTIVE:
-            tenant.activate()
-            flash(f"Tenant '{tenant.name}' activated", 'success')
-        elif new_status == TenantStatus.INACTIVE:
-            tenant.deactivate()
-            flash(f"Tenant '{tenant.name}' deactivated", 'success')
-        elif new_status == TenantStatus.SUSPENDED:
-            tenant.suspend()
-            flash(f"Tenant '{tenant.name}' suspended", 'success')
+        transition, verb = actions[new_status]
+        transition()
+        flash(f"Tenant '{tenant.name}' {verb}", 'success')
         
         return redirect(url_for('tenant.view', slug=slug))
         
@@ -282,33 +238,17 @@ def quota(slug):
     """View tenant quota and usage"""
     # TODO: Add authorization check for admin or tenant owner
     
-    tenant = Tenant.get_tenant_by_slug(slug)
+    # Read-only page, so a recently cached tenant is good enough
+    tenant = get_tenant_by_slug_cached(slug, cache_misses=False)
     if not tenant:
         flash(f"Tenant '{slug}' not found", 'warning')
         return redirect(url_for('tenant.index'))
     
-    # Get usage data
-    user_usage = QuotaManager.get_usage(tenant, ResourceType.USERS)
-    storage_usage = QuotaManager.get_usage(tenant, ResourceType.STORAGE)
-    api_calls = QuotaManager.get_usage(tenant, ResourceType.API_CALLS)
-    
-    tenant_data = {
-        'id': tenant.id,
-        'name': tenant.name,
-        'slug': tenant.slug,
-        'plan': tenant.plan,
-        'quotas': {
-            'max_users': tenant.max_users,
-            'max_storage_mb': tenant.max_storage_mb
-        },
-        'usage': {
-            'users': user_usage,
-            'storage_mb': storage_usage,
-            'api_calls': api_calls,
-            'users_percentage': QuotaManager.get_usage_percentage(tenant, ResourceType.USERS),
-            'storage_percentage': QuotaManager.get_usage_percentage(tenant, ResourceType.STORAGE)
-        }
-    }
+    # Get usage data, including API calls
+    usage = QuotaManager.get_usage_bulk(
+        tenant, [ResourceType.USERS, ResourceType.STORAGE, ResourceType.API_CALLS]
+    )
+    tenant_data = tenant.to_view_dict(fields=('id', 'name', 'slug', 'plan'), usage=usage)
     
     return render_template('tenant/quota.html', 
                           title=f"Quota: {tenant.name}", 
@@ -0,0 +1,44 @@
+"""Server-side timestamp defaults
+
+Revision ID: c3e1f7a9b2d4
+Revises: 94f836455022
+Create Date: 2025-05-07 10:12:44.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e1f7a9b2d4'
+down_revision = '94f836455022'
+branch_labels = None
+depends_on = None
+
+TABLES = ['tenants', 'tenant_usage', 'roles', 'users', 'plugins', 'tenant_plugins']
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('created_at',
+                   existing_type=sa.DateTime(),
+                   server_default=sa.text('now()'),
+                   existing_nullable=True)
+            batch_op.alter_column('updated_at',
+                   existing_type=sa.DateTime(),
+                   server_default=sa.text('now()'),
+                   existing_nullable=True)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('updated_at',
+                   existing_type=sa.DateTime(),
+                   server_default=None,
+                   existing_nullable=True)
+            batch_op.alter_column('created_at',
+                   existing_type=sa.DateTime(),
+                   server_default=None,
+                   existing_nullable=True)
@@ -0,0 +1,30 @@
+"""Partial indexes on enabled tenant plugins
+
+Revision ID: d8f2b6c4e1a7
+Revises: c3e1f7a9b2d4
+Create Date: 2025-05-08 09:41:17.302915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f2b6c4e1a7'
+down_revision = 'c3e1f7a9b2d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tenant_plugins', schema=None) as batch_op:
+        batch_op.create_index('ix_tp_tenant_enabled', ['tenant_id'], unique=False,
+                              postgresql_where=sa.text('enabled = true'))
+        batch_op.create_index('ix_tp_plugin_enabled', ['plugin_id'], unique=False,
+                              postgresql_where=sa.text('enabled = true'))
+
+
+def downgrade():
+    with op.batch_alter_table('tenant_plugins', schema=None) as batch_op:
+        batch_op.drop_index('ix_tp_plugin_enabled')
+        batch_op.drop_index('ix_tp_tenant_enabled')
@@ -0,0 +1,31 @@
+"""Cascade deletes from tenants and plugins to tenant_plugins
+
+Revision ID: e5a9c3d7f2b8
+Revises: d8f2b6c4e1a7
+Create Date: 2025-05-08 14:26:03.871542
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a9c3d7f2b8'
+down_revision = 'd8f2b6c4e1a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tenant_plugins', schema=None) as batch_op:
+        batch_op.drop_constraint('tenant_plugins_tenant_id_fkey', type_='foreignkey')
+        batch_op.drop_constraint('tenant_plugins_plugin_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('tenant_plugins_tenant_id_fkey', 'tenants', ['tenant_id'], ['id'], ondelete='CASCADE')
+        batch_op.create_foreign_key('tenant_plugins_plugin_id_fkey', 'plugins', ['plugin_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    with op.batch_alter_table('tenant_plugins', schema=None) as batch_op:
+        batch_op.drop_constraint('tenant_plugins_plugin_id_fkey', type_='foreignkey')
+        batch_op.drop_constraint('tenant_plugins_tenant_id_fkey', type_='foreignkey')
+        batch_op.create_foreign_key('tenant_plugins_plugin_id_fkey', 'plugins', ['plugin_id'], ['id'])
+        batch_op.create_foreign_key('tenant_plugins_tenant_id_fkey', 'tenants', ['tenant_id'], ['id'])
@@ -0,0 +1,27 @@
+"""Partial index on active and provisioning tenant status
+
+Revision ID: f2b7d4e9a1c6
+Revises: e5a9c3d7f2b8
+Create Date: 2025-05-09 10:12:44.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b7d4e9a1c6'
+down_revision = 'e5a9c3d7f2b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tenants', schema=None) as batch_op:
+        batch_op.create_index('ix_tenants_status', ['status'], unique=False,
+                              postgresql_where=sa.text("status IN ('active', 'provisioning')"))
+
+
+def downgrade():
+    with op.batch_alter_table('tenants', schema=None) as batch_op:
+        batch_op.drop_index('ix_tenants_status')
@@ -1,5 +1,6 @@
 """Example plugin implementation"""
-from flask import Blueprint, render_template, jsonify, request
+from flask import Blueprint, Response, render_template, request
+import json
 
 class ExamplePlugin:
     """Example plugin class"""
@@ -7,7 +8,19 @@ class ExamplePlugin:
     def __init__(self, config=None):
         """Initialize the plugin with configuration"""
         self.config = config or {}
-        self.blueprint = self._create_blueprint()
+        # Only the app-level instance registers a blueprint; per-tenant
+        # instances never need one, so it is built on first get_blueprint() call
+        self._blueprint = None
+        
+        # Config is fixed for the lifetime of the instance, so the
+        # /api/data payload is encoded once up front
+        self._data_body = json.dumps({
+            'status': 'success',
+            'data': {
+                'message': 'Hello from example plugin!',
+                'config': self.config
+            }
+        }).encode('utf-8')
     
     def _create_blueprint(self):
         """Create a Flask blueprint for the plugin"""
@@ -27,19 +40,15 @@ class ExamplePlugin:
         @bp.route('/api/data')
         def get_data():
             """Sample API endpoint"""
-            return jsonify({
-                'status': 'success',
-                'data': {
-                    'message': 'Hello from example plugin!',
-                    'config': self.config
-                }
-            })
+            return Response(self._data_body, mimetype='application/json')
         
         return bp
     
     def get_blueprint(self):
-        """Get the plugin's blueprint"""
-        return self.blueprint
+        """Get the plugin's blueprint, creating it on first use"""
+        if self._blueprint is None:
+            self._blueprint = self._create_blueprint()
+        return self._blueprint
     
     def get_menu_items(self):
         """Get menu items for the sidebar"""
@@ -3,6 +3,14 @@ from flask_sqlalchemy import SQLAlchemy
 from app import db
 from app.core.db import BaseModel
 from datetime import datetime
+from sqlalchemy import literal, not_, select, text
+import time
+
+# Seconds a user's category list is reused; other workers may lag by this much
+CATEGORY_CACHE_TTL = 60
+
+# user_id -> (expires_at, list of categories)
+_category_cache = {}
 
 class Note(BaseModel):
     """Note model for storing user notes"""
@@ -22,6 +30,17 @@ class Note(BaseModel):
     tenant = db.relationship('Tenant', backref=db.backref('notes', lazy='dynamic'))
     user = db.relationship('User', backref=db.backref('notes', lazy='dynamic'))
     
+    # Partial indexes matching the unarchived note listings; scanned backwards
+    # they return rows already in is_pinned DESC, updated_at DESC order.
+    # ix_notes_user_category covers the category filter list, archived notes included
+    __table_args__ = (
+        db.Index('ix_notes_user_category', 'user_id', 'category'),
+        db.Index('ix_notes_user_active', 'user_id', 'is_pinned', 'updated_at',
+                 postgresql_where=db.text('is_archived = false')),
+        db.Index('ix_notes_user_cat', 'user_id', 'category', 'is_pinned', 'updated_at',
+                 postgresql_where=db.text('is_archived = false')),
+    )
+    
     def __repr__(self):
         return f'<Note {self.title}>'
     
@@ -37,24 +56,117 @@ class Note(BaseModel):
         )
         db.session.add(note)
         db.session.commit()
+        if category:
+            cls.invalidate_categories(user_id)
         return note
     
     @classmethod
-    def get_notes_for_user(cls, user_id, include_archived=False):
-        """Get all notes for a user"""
+    def create_note_within_limit(cls, max_notes, tenant_id, user_id, title, content,
+                                 category=None, is_pinned=False):
+        """Create a note unless the user already has max_notes in the tenant
+        
+        Returns the new note's id, or None if the limit is reached. The count and
+        the INSERT are one statement, run under a per-user advisory lock so
+        concurrent creates cannot both take the last free slot.
+        """
+        table = cls.__table__
+        existing = select(db.func.count()).select_from(table).where(
+            table.c.user_id == user_id,
+            table.c.tenant_id == tenant_id
+        ).scalar_subquery()
+        row = select(
+            literal(tenant_id), literal(user_id), literal(title), literal(content),
+            literal(category, db.String(50)), literal(bool(is_pinned)), literal(False)
+        ).where(existing < max_notes)
+        stmt = table.insert().from_select(
+            ['tenant_id', 'user_id', 'title', 'content', 'category', 'is_pinned', 'is_archived'],
+            row
+        ).returning(table.c.id)
+        
+        try:
+            db.session.execute(text('SELECT pg_advisory_xact_lock(hashtext(:key))'),
+                               {'key': f'notes_plugin:{user_id}'})
+            note_id = db.session.execute(stmt).scalar()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        if note_id is not None and category:
+            cls.invalidate_categories(user_id)
+        return note_id
+    
+    @classmethod
+    def toggle_flag(cls, note_id, user_id, tenant_id, flag):
+        """Flip is_pinned or is_archived server-side for a note the user owns
+        
+        Returns the new value, or None if no such note exists. tenant_id may be
+        None to skip the tenant check.
+        """
+        if flag not in ('is_pinned', 'is_archived'):
+            raise ValueError(f"Not a note flag: {flag!r}")
+        
+        table = cls.__table__
+        column = table.c[flag]
+        stmt = table.update().where(
+            table.c.id == note_id,
+            table.c.user_id == user_id
+        )
+        if tenant_id:
+            stmt = stmt.where(table.c.tenant_id == tenant_id)
+        stmt = stmt.values({flag: not_(db.func.coalesce(column, False))}).returning(column)
+        
+        try:
+            value = db.session.execute(stmt).scalar()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return value
+    
+    @classmethod
+    def get_notes_for_user(cls, user_id, include_archived=False, page=1, per_page=50):
+        """Get one page of a user's notes"""
         query = cls.query.filter_by(user_id=user_id)
         
         if not include_archived:
             query = query.filter_by(is_archived=False)
             
-        return query.order_by(cls.is_pinned.desc(), cls.updated_at.desc()).all()
+        return query.order_by(cls.is_pinned.desc(), cls.updated_at.desc()).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
     
     @classmethod
-    def get_notes_by_category(cls, user_id, category, include_archived=False):
-        """Get notes for a user filtered by category"""
+    def get_notes_by_category(cls, user_id, category, include_archived=False, page=1, per_page=50):
+        """Get one page of a user's notes filtered by category"""
         query = cls.query.filter_by(user_id=user_id, category=category)
         
         if not include_archived:
             query = query.filter_by(is_archived=False)
             
-        return query.order_by(cls.is_pinned.desc(), cls.updated_at.desc()).all()
\ No newline at end of file
+        return query.order_by(cls.is_pinned.desc(), cls.updated_at.desc()).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+    
+    @classmethod
+    def get_categories_for_user(cls, user_id):
+        """Get the distinct non-empty categories of a user's notes, cached per process"""
+        cached = _category_cache.get(user_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        
+        # GROUP BY rather than DISTINCT, so the planner can use ix_notes_user_category
+        rows = db.session.query(cls.category).filter(
+            cls.user_id == user_id,
+            cls.category != None,
+            cls.category != ''
+        ).group_by(cls.category).order_by(cls.category).all()
+        
+        categories = [row[0] for row in rows]
+        _category_cache[user_id] = (time.monotonic() + CATEGORY_CACHE_TTL, categories)
+        return categories
+    
+    @staticmethod
+    def invalidate_categories(user_id):
+        """Forget a user's cached category list after their notes change"""
+        _category_cache.pop(user_id, None)
@@ -4,7 +4,7 @@ from flask_login import current_user, login_required
 from app.auth.rbac import permission_required
 from app.tenant.middleware import tenant_required, get_current_tenant
 from app import db
-import os
+from sqlalchemy import text
 import logging
 from datetime import datetime
 from .models import Note
@@ -18,7 +18,9 @@ class NotesPlugin:
     def __init__(self, config=None):
         """Initialize the plugin with configuration"""
         self.config = config or {}
-        self.blueprint = self._create_blueprint()
+        # Only the app-level instance registers a blueprint; per-tenant
+        # instances never need one, so it is built on first get_blueprint() call
+        self._blueprint = None
         
         # Get configuration values with defaults
         self.max_notes_per_user = self.config.get('max_notes_per_user', 100)
@@ -28,8 +30,6 @@ class NotesPlugin:
     def _create_blueprint(self):
         """Create a Flask blueprint for the plugin"""
         # The static_folder and template_folder are relative to the plugin directory
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        
         bp = Blueprint(
             'notes_plugin',
             __name__,
@@ -38,6 +38,29 @@ class NotesPlugin:
             url_prefix='/plugins/notes'
         )
         
+        def current_tenant_id():
+            """ID of the current tenant, falling back to the user's own tenant"""
+            tenant = get_current_tenant()
+            return tenant.id if tenant else current_user.tenant_id
+        
+        def get_own_note_or_404(note_id):
+            """Fetch a note owned by the current user in the current tenant, or 404"""
+            tenant_id = current_tenant_id()
+            
+            # Ownership and tenant are part of the primary key lookup, so other
+            # users' notes are never loaded just to be rejected
+            query = Note.query.filter_by(id=note_id, user_id=current_user.id)
+            if tenant_id:
+                query = query.filter_by(tenant_id=tenant_id)
+            return query.first_or_404()
+        
+        def toggle_own_note_flag_or_404(note_id, flag):
+            """Flip a boolean column of an owned note in one UPDATE, returning its new value"""
+            value = Note.toggle_flag(note_id, current_user.id, current_tenant_id(), flag)
+            if value is None:
+                abort(404)
+            return value
+        
         @bp.route('/')
         @login_required
         def index():
@@ -46,25 +69,21 @@ class NotesPlugin:
             user_id = current_user.id
             category = request.args.get('category')
             include_archived = request.args.get('archived', 'false') == 'true'
+            page = request.args.get('page', 1, type=int)
             
-            # Get notes using user_id
+            # Get one page of notes using user_id
             if category:
-                notes = Note.get_notes_by_category(user_id, category, include_archived)
+                pagination = Note.get_notes_by_category(user_id, category, include_archived, page=page)
             else:
-                notes = Note.get_notes_for_user(user_id, include_archived)
+                pagination = Note.get_notes_for_user(user_id, include_archived, page=page)
             
             # Get all distinct categories for the filter
-            categories = db.session.query(Note.category).filter(
-                Note.user_id == user_id,
-                Note.category != None,
-                Note.category != ''
-            ).distinct().all()
-            
-            categories = [c[0] for c in categories]
+            categories = Note.get_categories_for_user(user_id)
             
             return render_template(
                 'notes_plugin/index.html', 
-                notes=notes, 
+                notes=pagination.items, 
+                pagination=pagination, 
                 categories=categories,
                 current_category=category,
                 include_archived=include_archived,
@@ -86,31 +105,38 @@ class NotesPlugin:
                 
             form = NoteForm()
             
-            # Check if user has reached the limit
-            user_notes_count = Note.query.filter_by(
-                user_id=current_user.id,
-                tenant_id=tenant_id
-            ).count()
+            limit_message = f'You have reached the maximum limit of {self.max_notes_per_user} notes.'
             
-            if user_notes_count >= self.max_notes_per_user:
-                flash(f'You have reached the maximum limit of {self.max_notes_per_user} notes.', 'warning')
-                return redirect(url_for('notes_plugin.index'))
+            # Check if user has reached the limit before showing the form;
+            # submissions are checked atomically by the insert itself
+            if request.method == 'GET':
+                # A bare count(*), not Query.count()'s SELECT count(*) FROM (SELECT ...)
+                user_notes_count = db.session.query(db.func.count(Note.id)).filter(
+                    Note.user_id == current_user.id,
+                    Note.tenant_id == tenant_id
+                ).scalar()
+                
+                if user_notes_count >= self.max_notes_per_user:
+                    flash(limit_message, 'warning')
+                    return redirect(url_for('notes_plugin.index'))
             
             if form.validate_on_submit():
                 # Hide category field if categories are disabled
                 category = form.category.data if self.enable_categories else None
                 
-                note = Note.create_note(
+                note_id = Note.create_note_within_limit(
+                    self.max_notes_per_user,
                     tenant_id=tenant_id,
                     user_id=current_user.id,
                     title=form.title.data,
                     content=form.content.data,
-                    category=category
+                    category=category,
+                    is_pinned=form.is_pinned.data
                 )
                 
-                if form.is_pinned.data:
-                    note.is_pinned = True
-                    db.session.commit()
+                if note_id is None:
+                    flash(limit_message, 'warning')
+                    return redirect(url_for('notes_plugin.index'))
                 
                 flash('Note created successfully!', 'success')
                 return redirect(url_for('notes_plugin.index'))
@@ -144,18 +170,7 @@ class NotesPlugin:
         @login_required
         def edit(note_id):
             """Edit a note"""
-            note = Note.query.get_or_404(note_id)
-            
-            # Check if user owns the note
-            if note.user_id != current_user.id:
-                abort(403)
-            
-            # Check if note belongs to the current tenant
-            tenant = get_current_tenant()
-            tenant_id = tenant.id if tenant else current_user.tenant_id
-            
-            if tenant_id and note.tenant_id != tenant_id:
-                abort(404)
+            note = get_own_note_or_404(note_id)
             
             form = NoteForm(obj=note)
             
@@ -167,6 +182,7 @@ class NotesPlugin:
                     note.category = None
                 
                 db.session.commit()
+                Note.invalidate_categories(current_user.id)
                 flash('Note updated successfully!', 'success')
                 return redirect(url_for('notes_plugin.index'))
             
@@ -181,67 +197,31 @@ class NotesPlugin:
         @login_required
         def toggle_pin(note_id):
             """Toggle pin status of a note"""
-            note = Note.query.get_or_404(note_id)
-            
-            # Check if user owns the note
-            if note.user_id != current_user.id:
-                abort(403)
-            
-            # Check if note belongs to the current tenant
-            tenant = get_current_tenant()
-            tenant_id = tenant.id if tenant else current_user.tenant_id
+            is_pinned = toggle_own_note_flag_or_404(note_id, 'is_pinned')
             
-            if tenant_id and note.tenant_id != tenant_id:
-                abort(404)
-            
-            note.is_pinned = not note.is_pinned
-            db.session.commit()
-            
-            flash(f'Note {"pinned" if note.is_pinned else "unpinned"}!', 'success')
+            flash(f'Note {"pinned" if is_pinned else "unpinned"}!', 'success')
             return redirect(url_for('notes_plugin.index'))
         
         @bp.route('/<int:note_id>/archive', methods=['POST'])
         @login_required
         def toggle_archive(note_id):
             """Toggle archive status of a note"""
-            note = Note.query.get_or_404(note_id)
-            
-            # Check if user owns the note
-            if note.user_id != current_user.id:
-                abort(403)
+            is_archived = toggle_own_note_flag_or_404(note_id, 'is_archived')
             
-            # Check if note belongs to the current tenant
-            tenant = get_current_tenant()
-            tenant_id = tenant.id if tenant else current_user.tenant_id
-            
-            if tenant_id and note.tenant_id != tenant_id:
-                abort(404)
-            
-            note.is_archived = not note.is_archived
-            db.session.commit()
-            
-            flash(f'Note {"archived" if note.is_archived else "restored"}!', 'success')
+            flash(f'Note {"archived" if is_archived else "restored"}!', 'success')
             return redirect(url_for('notes_plugin.index'))
         
         @bp.route('/<int:note_id>/delete', methods=['POST'])
         @login_required
         def delete(note_id):
             """Delete a note"""
-            note = Note.query.get_or_404(note_id)
-            
-            # Check if user owns the note
-            if note.user_id != current_user.id:
-                abort(403)
-            
-            # Check if note belongs to the current tenant
-            tenant = get_current_tenant()
-            tenant_id = tenant.id if tenant else current_user.tenant_id
-            
-            if tenant_id and note.tenant_id != tenant_id:
-                abort(404)
+            note = get_own_note_or_404(note_id)
             
+            had_category = bool(note.category)
             db.session.delete(note)
             db.session.commit()
+            if had_category:
+                Note.invalidate_categories(current_user.id)
             
             flash('Note deleted successfully!', 'success')
             return redirect(url_for('notes_plugin.index'))
@@ -249,8 +229,10 @@ class NotesPlugin:
         return bp
     
     def get_blueprint(self):
-        """Get the plugin's blueprint"""
-        return self.blueprint
+        """Get the plugin's blueprint, creating it on first use"""
+        if self._blueprint is None:
+            self._blueprint = self._create_blueprint()
+        return self._blueprint
     
     def get_menu_items(self):
         """Get menu items for the sidebar"""
@@ -270,8 +252,19 @@ class NotesPlugin:
             from app import db
             from .models import Note
             
-            # Create tables if they don't exist
+            # Create tables if they don't exist, and indexes added since
             Note.__table__.create(db.engine, checkfirst=True)
+            for index in Note.__table__.indexes:
+                index.create(db.engine, checkfirst=True)
+            
+            # Tables created before BaseModel moved to server-side timestamps
+            # lack the defaults; SET DEFAULT is a no-op when already present
+            with db.engine.begin() as connection:
+                connection.execute(text(
+                    'ALTER TABLE notes_plugin_notes '
+                    'ALTER COLUMN created_at SET DEFAULT now(), '
+                    'ALTER COLUMN updated_at SET DEFAULT now()'
+                ))
             logger.info("Notes plugin installed successfully")
             return True
         except Exception as e:
@@ -286,11 +279,13 @@ class NotesPlugin:
             # if the tenant wants to keep their data
             if tenant_id:
                 from .models import Note
-                Note.query.filter_by(tenant_id=tenant_id).delete()
+                # Plain DELETE; none of these notes need syncing in the session
+                Note.query.filter_by(tenant_id=tenant_id).delete(synchronize_session=False)
                 db.session.commit()
             
             logger.info("Notes plugin uninstalled successfully")
             return True
         except Exception as e:
+            db.session.rollback()
             logger.error(f"Error uninstalling Notes plugin: {str(e)}")
             return False
\ No newline at end of file